@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""Time the hot paths of a run as its tables grow.
+
+A synthetic run is seeded in stages in the database from
+settings/database.yaml (SQLite or a local PostgreSQL). After each stage every
+hot path is timed against the tables as they stand, both as called without
+any in-memory index (cold) and with the indexes a run keeps (cached). Results
+are written as JSON so they can be compared between commits:
+
+    python -m benchmarks.hot_paths --stages 5 --generations 20 --children 100
+
+"""
+from datetime import datetime
+import json
+import os
+import subprocess
+import time
+
+import click
+
+from oedipus.db import session, Box, MutationStrength, RngState
+from oedipus.bins import BinCounts
+from oedipus.population import Population
+from oedipus.strengths import MutationStrengthCache
+from oedipus.binning import Binning
+from oedipus.memory import MemoryRun
+from oedipus.executor import SerialExecutor
+from oedipus.oedipus import simulate_arrays, evaluate_convergence
+from oedipus.box_generator import mutate
+
+def best_of(function, repeat, cleanup=None):
+    """Shortest wall time, in seconds, of calling function repeat times.
+    cleanup, if given, is called untimed after each call."""
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+        if cleanup is not None:
+            cleanup()
+    return min(times)
+
+def seed(run, generations, executor):
+    """Add generations to a synthetic run and checkpoint them."""
+    for gen in range(run.next_generation, run.next_generation + generations):
+        children = run.new_children(gen)
+        children.update(simulate_arrays(children['x'], children['y'],
+                children['z'], run.binning, executor))
+        run.add_generation(gen, children)
+    run.checkpoint()
+
+def discard_run(run_id):
+    """Remove every row of the synthetic run."""
+    session.query(Box).filter(Box.run_id == run_id).delete()
+    session.query(MutationStrength) \
+            .filter(MutationStrength.run_id == run_id).delete()
+    session.query(RngState).filter(RngState.run_id == run_id).delete()
+    session.commit()
+
+def discard_generation(run_id, generation):
+    """Remove rows a timed call wrote for a generation not yet seeded."""
+    session.query(Box).filter(Box.run_id == run_id,
+            Box.generation == generation).delete()
+    session.query(MutationStrength).filter(MutationStrength.run_id == run_id,
+            MutationStrength.generation == generation).delete()
+    session.commit()
+
+def time_hot_paths(run_id, gen, config, repeat):
+    """Time each hot path as if creating generation gen of a seeded run.
+
+    Returns:
+        timings (dict): shortest wall time of each hot path, in seconds.
+
+    """
+    mutate_config = config['mutate']
+    n = config['children_per_generation']
+    binning = Binning.from_config(config)
+
+    bin_counts = BinCounts.from_database(run_id, gen - 1)
+    population = Population.from_database(run_id, gen - 1)
+    strengths = MutationStrengthCache.from_database(run_id,
+            mutate_config['initial_mutation_strength'])
+
+    timings = {}
+    timings['smallest_bin_selection (cold)'] = best_of(lambda:
+            mutate.smallest_bin_selection(run_id, gen - 1, n), repeat)
+    timings['smallest_bin_selection (cached)'] = best_of(lambda:
+            mutate.smallest_bin_selection(run_id, gen - 1, n, bin_counts), repeat)
+    timings['center_of_mass_selection (cold)'] = best_of(lambda:
+            mutate.center_of_mass_selection(run_id, gen - 1, n), repeat)
+    timings['center_of_mass_selection (cached)'] = best_of(lambda:
+            mutate.center_of_mass_selection(run_id, gen - 1, n, population), repeat)
+    timings['evaluate_convergence (cold)'] = best_of(lambda:
+            evaluate_convergence(run_id, gen, -1.), repeat)
+    timings['evaluate_convergence (cached)'] = best_of(lambda:
+            evaluate_convergence(run_id, gen, -1., bin_counts), repeat)
+
+    discard = lambda: discard_generation(run_id, gen)
+    timings['calculate_all_mutation_strengths'] = best_of(lambda:
+            mutate.calculate_all_mutation_strengths(run_id, gen - 1,
+                    mutate_config['initial_mutation_strength']), repeat, discard)
+
+    # mutation strengths are timed above, so new_boxes only reads
+    batches = []
+    def new_boxes(**indexes):
+        batches[:] = [mutate.new_boxes(run_id, gen, n, mutate_config,
+                update_strengths=False, **indexes)]
+    timings['new_boxes (cold)'] = best_of(new_boxes, repeat)
+    timings['new_boxes (cached)'] = best_of(lambda: new_boxes(
+            bin_counts=bin_counts, population=population, strengths=strengths),
+            repeat)
+
+    batch = batches[0]
+    batch.update(simulate_arrays(batch['x'], batch['y'], batch['z'], binning,
+            SerialExecutor()))
+    def commit(mode):
+        start = time.perf_counter()
+        batch.insert(mode)
+        session.commit()
+        elapsed = time.perf_counter() - start
+        discard_generation(run_id, gen)
+        return elapsed
+    timings['commit (orm)'] = min(commit('orm') for i in range(repeat))
+    timings['commit (bulk)'] = min(commit('bulk') for i in range(repeat))
+    return timings
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+@click.command()
+@click.option('--stages', default=5, help='number of table sizes to time')
+@click.option('--generations', default=20, help='generations seeded per stage')
+@click.option('--children', default=100, help='boxes per generation')
+@click.option('--bins', default=40, help='number_of_convergence_bins')
+@click.option('--repeat', default=3, help='timings per hot path; the best is kept')
+@click.option('--output', default='benchmark.json', type=click.Path(),
+        help='JSON file to write results to')
+@click.option('--keep', is_flag=True, help='keep the synthetic run in the database')
+def hot_paths(stages, generations, children, bins, repeat, output, keep):
+    """Time each hot path as a synthetic run grows."""
+    run_id = 'benchmark-{}'.format(datetime.now().isoformat())
+    config = {
+        'generator_type': 'mutate',
+        'number_of_convergence_bins': bins,
+        'children_per_generation': children,
+        'mutate': {
+            'initial_mutation_strength': 0.2,
+            'mutation_scheme': 'hybrid_adaptive',
+            'selection_scheme': 'hybrid',
+        },
+    }
+    run = MemoryRun(run_id, config)
+    executor = SerialExecutor()
+    results = {
+        'revision': git_revision(),
+        'database': session.get_bind().dialect.name,
+        'run_id': run_id,
+        'children_per_generation': children,
+        'number_of_convergence_bins': bins,
+        'stages': [],
+    }
+
+    try:
+        for stage in range(stages):
+            seed(run, generations, executor)
+            timings = time_hot_paths(run_id, run.next_generation, config, repeat)
+            results['stages'].append({
+                'generations': run.next_generation,
+                'boxes': len(run.population),
+                'timings': timings,
+            })
+            print('{} boxes'.format(len(run.population)))
+            for name, seconds in timings.items():
+                print('    {:36s} {:10.6f} s'.format(name, seconds))
+    finally:
+        if not keep:
+            discard_run(run_id)
+
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    hot_paths()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Compare insert throughput of the ORM and bulk paths for the `boxes` table.
+
+Uses the database in settings/database.yaml, so run it once per database
+configuration (e.g. SQLite and PostgreSQL):
+
+    python -m benchmarks.insert --generations 20 --children 1000
+
+"""
+from datetime import datetime
+import time
+
+import click
+import numpy as np
+
+from oedipus.db import session, Box
+from oedipus.batch import BoxBatch
+from oedipus.binning import Binning
+
+def make_batch(run_id, generation, children):
+    x, y, z, alpha, beta = np.random.random((5, children))
+    batch = BoxBatch(run_id, generation, x, y, z, parent_id=np.arange(children))
+    batch.update(Binning(40).columns({'alpha': alpha, 'beta': beta}))
+    batch.update({'alpha': alpha, 'beta': beta})
+    return batch
+
+def time_inserts(mode, generations, children):
+    run_id = 'benchmark-insert-{}-{}'.format(mode, datetime.now().isoformat())
+    elapsed = 0.
+    for gen in range(generations):
+        batch = make_batch(run_id, gen, children)
+        start = time.perf_counter()
+        batch.insert(mode)
+        session.commit()
+        elapsed += time.perf_counter() - start
+    session.query(Box).filter(Box.run_id == run_id).delete()
+    session.commit()
+    return generations * children / elapsed
+
+@click.command()
+@click.option('--generations', default=20, help='generations to insert per mode')
+@click.option('--children', default=100, help='boxes per generation')
+def insert(generations, children):
+    """Print boxes inserted per second for each insert mode."""
+    print('database: {}'.format(session.get_bind().url))
+    for mode in ['orm', 'bulk']:
+        rate = time_inserts(mode, generations, children)
+        print('{:5s} {:12.0f} boxes/s'.format(mode, rate))
+
+if __name__ == '__main__':
+    insert()
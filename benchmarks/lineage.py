@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Time lineage queries over a whole run against walking parents per row.
+
+A synthetic run is created in memory and checkpointed to the database from
+settings/database.yaml, then every material's ancestors and every root's
+descendants are found with `Lineage`, with the recursive queries of
+`query_ancestors` and `query_descendants`, and, for a sample, by following
+`parent_id` with one ORM `get` per ancestor:
+
+    python -m benchmarks.lineage --generations 300 --children 1000
+
+"""
+from datetime import datetime
+import time
+
+import click
+import numpy as np
+
+from oedipus.db import session, Box, RngState
+from oedipus.memory import MemoryRun
+from oedipus.executor import SerialExecutor
+from oedipus.oedipus import simulate_arrays
+from oedipus.lineage import Lineage, query_ancestors, query_descendants
+
+def seed_run(run_id, generations, children):
+    config = {
+        'generator_type': 'mutate',
+        'number_of_convergence_bins': 40,
+        'children_per_generation': children,
+        'seed': 0,
+        'mutate': {
+            'initial_mutation_strength': 0.2,
+            'mutation_scheme': 'flat',
+            'selection_scheme': 'smallest_bin',
+        },
+    }
+    run = MemoryRun(run_id, config)
+    for gen in range(generations):
+        batch = run.new_children(gen)
+        batch.update(simulate_arrays(batch['x'], batch['y'], batch['z'],
+                run.binning, SerialExecutor()))
+        run.add_generation(gen, batch)
+    run.checkpoint()
+
+def timed(label, function, boxes):
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    print('{:32s} {:8.2f} s  {:12.0f} boxes/s'.format(label, elapsed,
+            boxes / elapsed))
+    return result
+
+def walk_parents(box_id):
+    ancestors = []
+    box = session.query(Box).get(box_id)
+    while box.parent_id is not None:
+        box = session.query(Box).get(box.parent_id)
+        ancestors.append(box.id)
+    return ancestors
+
+@click.command()
+@click.option('--generations', default=300, help='generations in the run')
+@click.option('--children', default=1000, help='boxes per generation')
+@click.option('--sample', default=100, help='boxes walked with ORM gets')
+def lineage(generations, children, sample):
+    """Print the time of each way of finding ancestors and descendants."""
+    print('database: {}'.format(session.get_bind().url))
+    run_id = 'benchmark-lineage-{}'.format(datetime.now().isoformat())
+    seed_run(run_id, generations, children)
+    boxes = generations * children
+
+    lin = timed('load Lineage', lambda: Lineage.from_database(run_id), boxes)
+    roots = lin.ids[lin.depth == 0]
+    timed('Lineage.ancestors (all)', lambda: lin.ancestors(lin.ids), boxes)
+    timed('Lineage.descendants (roots)', lambda: lin.descendants(roots), boxes)
+    timed('Lineage.root_counts', lambda: lin.root_counts(), boxes)
+    timed('query_ancestors (all)',
+            lambda: query_ancestors(run_id, lin.ids.tolist()), boxes)
+    timed('query_descendants (roots)',
+            lambda: query_descendants(run_id, roots.tolist()), boxes)
+    walked = np.random.default_rng(0).choice(lin.ids, sample)
+    timed('ORM get per parent (sample)',
+            lambda: [walk_parents(box_id) for box_id in walked.tolist()], sample)
+
+    session.query(Box).filter(Box.run_id == run_id).delete()
+    session.query(RngState).filter(RngState.run_id == run_id).delete()
+    session.commit()
+
+if __name__ == '__main__':
+    lineage()
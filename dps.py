@@ -2,20 +2,92 @@
 
 import click
 
+from oedipus.db import Box
 from oedipus.oedipus import oedipus
+from oedipus.sweep import sweep as run_sweep
+from oedipus.export import export_run
 
-@click.command()
+class DefaultGroup(click.Group):
+    """Group invoking `default_command` when no command is named, so that
+    `dps CONFIG` keeps working next to `dps sweep SWEEP`."""
+
+    default_command = 'run'
+
+    def parse_args(self, ctx, args):
+        if args and args[0] not in self.commands and args[0] != '--help':
+            args.insert(0, self.default_command)
+        return super().parse_args(ctx, args)
+
+@click.group(cls=DefaultGroup)
+def dps():
+    """Start processes to manage runs."""
+
+@dps.command()
 @click.argument('config_path',type=click.Path())
-def dps(config_path):
+@click.option('--stats', 'stats_path', type=click.Path(),
+        help='Append per-generation phase timings and SQL counts to this JSON lines file.')
+@click.option('--stats-table', is_flag=True,
+        help='Also write phase timings to the generation_stats table.')
+@click.option('--run-id', help='Identification string for run (default = current time).')
+@click.option('--worker', is_flag=True,
+        help='Run as one of several workers sharing --run-id, claiming slots of each generation through the database.')
+@click.option('--resume', 'resume_id', metavar='RUN_ID',
+        help='Continue this run from its last committed generation.')
+def run(config_path, stats_path, stats_table, run_id, worker, resume_id):
     """Start process to manage run.
 
     Args:
         run_id (str): identification string for run.
 
-    Runs OEDIPUS-method in one process.
+    Runs OEDIPUS-method in one process, or with --worker as one of any number
+    of processes, on one or several nodes, that share a run. This is the
+    default command: `dps CONFIG` is `dps run CONFIG`. With --resume, a run
+    that died continues from its last committed generation, with the same
+    config.
+
+    """
+    if resume_id is not None:
+        if run_id not in (None, resume_id):
+            raise click.UsageError('--resume and --run-id name different runs.')
+        run_id = resume_id
+    if worker and run_id is None:
+        raise click.UsageError('--worker needs the --run-id shared by every worker.')
+    if run_id is not None and not worker and resume_id is None and \
+            Box.run_exists(run_id):
+        raise click.UsageError('Run {} already has materials; continue it with '
+                '--resume, or join it with --worker.'.format(run_id))
+    oedipus(config_path, stats_path, stats_table, run_id, worker,
+            resume_id is not None)
+
+@dps.command()
+@click.argument('sweep_path',type=click.Path())
+@click.option('--processes', type=int,
+        help='Runs at once (default = processes in the sweep file).')
+def sweep(sweep_path, processes):
+    """Run a grid of configurations concurrently, sharing one database.
+
+    The sweep file names the base `config` and lists the values of each
+    swept parameter under `grid`; see settings/sweep.sample.yaml.
+
+    """
+    run_sweep(sweep_path, processes)
+
+@dps.command()
+@click.argument('run_id')
+@click.option('--output', type=click.Path(),
+        help='Directory to write the columns to (default = RUN_ID).')
+@click.option('--chunk-size', default=10000,
+        help='Rows fetched and written at a time.')
+def export(run_id, output, chunk_size):
+    """Write a run's boxes and mutation strengths as one .npy per column.
+
+    Files can be memory-mapped with numpy.load(..., mmap_mode='r'), or all at
+    once with oedipus.export.load_export; manifest.yaml lists them.
 
     """
-    oedipus(config_path)
+    manifest = export_run(run_id, output or run_id, chunk_size)
+    for table, description in manifest['tables'].items():
+        print('{}: {} rows'.format(table, description['rows']))
 
 if __name__ == '__main__':
     dps()
@@ -0,0 +1,107 @@
+import uuid
+
+import numpy as np
+
+from oedipus.db import session, Box
+from oedipus.population import Population
+
+class BoxBatch(object):
+    """Columnar batch of new materials, all from one run and generation.
+
+    Children are created, simulated and binned as NumPy arrays and only turned
+    into rows of the `boxes` table when inserted, so no `Box` objects are kept
+    in the session. Columns are those of `Population`; materials without a
+    parent have a `parent_id` of -1, and ids, as well as the `root_id` of
+    materials without a parent, are -1 until inserted.
+
+    Attributes:
+        run_id (str): identification string for run.
+        generation (int): iteration in bin-mutate-simulate routine.
+
+    """
+    def __init__(self, run_id, generation, x, y, z, parent_id=None,
+            root_id=None, depth=None):
+        n = len(x)
+        self.run_id = run_id
+        self.generation = generation
+        self._columns = {name: np.zeros(n, dtype=dtype)
+                for name, dtype in Population.dtypes.items()}
+        self._columns['id'][:] = -1
+        self._columns['generation'][:] = generation
+        self._columns['parent_id'][:] = -1 if parent_id is None else parent_id
+        self._columns['root_id'][:] = -1 if root_id is None else root_id
+        self._columns['depth'][:] = 0 if depth is None else depth
+        for name, values in zip('xyz', (x, y, z)):
+            self._columns[name][:] = values
+
+    def __len__(self):
+        return len(self._columns['id'])
+
+    def __getitem__(self, name):
+        return self._columns[name]
+
+    def update(self, columns):
+        """Set columns, e.g. the simulated properties and bins.
+
+        Args:
+            columns (dict): array of each column, as returned by
+                `oedipus.oedipus.simulate_arrays`. Names without a column,
+                e.g. the bin of a property without a `boxes` column, are
+                skipped.
+
+        """
+        for name, values in columns.items():
+            if name in self._columns:
+                self._columns[name][:] = values
+
+    def columns(self):
+        """Every column, as taken by `Population.append`."""
+        return dict(self._columns)
+
+    def rows(self):
+        """Column values of each material, as taken by `Box.insert_rows`.
+
+        Returns:
+            rows (list dict): one row per material. Uuids share one random
+            prefix per batch, so they are unique without a uuid4 per material.
+
+        """
+        prefix = uuid.uuid4().hex
+        columns = {name: self._columns[name].tolist() for name in
+                ['x', 'y', 'z', 'alpha', 'beta', 'alpha_bin', 'beta_bin', 'bin_key',
+                'depth']}
+        parent_ids = [None if p < 0 else p for p in self._columns['parent_id'].tolist()]
+        root_ids = [None if r < 0 else r for r in self._columns['root_id'].tolist()]
+        return [dict(run_id=self.run_id, uuid='{}-{}'.format(prefix, i),
+                generation=self.generation, parent_id=parent_ids[i],
+                root_id=root_ids[i],
+                **{name: values[i] for name, values in columns.items()})
+                for i in range(len(self))]
+
+    def insert(self, insert_mode='bulk'):
+        """Insert the batch and assign database ids, and the root ids of
+        materials without a parent. Nothing is committed.
+
+        Args:
+            insert_mode (str): 'bulk' writes rows with `Box.insert_rows`;
+                'orm' adds `Box` objects to the session, flushes them and
+                expunges them again.
+
+        """
+        rows = self.rows()
+        if insert_mode == 'bulk':
+            ids = Box.insert_rows(rows)
+        else:
+            boxes = [Box(self.run_id) for row in rows]
+            for box, row in zip(boxes, rows):
+                box.update_from_dict(row)
+            session.add_all(boxes)
+            session.flush()
+            ids = [box.id for box in boxes]
+            for box in boxes:
+                session.expunge(box)
+        self._columns['id'][:] = ids
+        roots = self._columns['root_id'] < 0
+        if roots.any():
+            Box.assign_roots(self.run_id, self.generation)
+            self._columns['root_id'][roots] = self._columns['id'][roots]
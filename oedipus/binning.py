@@ -0,0 +1,122 @@
+import numpy as np
+
+def calc_bins(values, bound_min, bound_max, bins):
+    """Find bins in parameter range for many values at once.
+
+    Args:
+        values (numpy.ndarray float): results of a simulation.
+        bound_min (float): lower limit, defining the parameter-space.
+        bound_max (float): upper limit, defining the parameter-space.
+        bins (int): number of bins used to subdivide parameter-space.
+
+    Returns:
+        Bins(numpy.ndarray int) corresponding to the input-values.
+
+    """
+    step = (bound_max - bound_min) / bins
+    assigned_bins = np.floor_divide(np.asarray(values) - bound_min, step)
+    return np.clip(assigned_bins, 0, bins - 1).astype(int)
+
+class Binning(object):
+    """Regular grid over any number of simulated properties.
+
+    Each property's range is divided into `number_of_convergence_bins` bins,
+    and the coordinates of a bin are linearized, in row-major order, into a
+    single integer bin key. Materials, bin-counts and mutation strengths are
+    all indexed by that key, so adding a property changes neither the schema
+    nor the cost of grouping by bin.
+
+    Attributes:
+        properties (list str): simulated properties, in coordinate order.
+        bounds (list): (bound_min, bound_max) of each property.
+        number_of_convergence_bins (int): bins per property.
+        shape (tuple int): bins along each property.
+
+    """
+    def __init__(self, number_of_convergence_bins, properties=('alpha', 'beta'),
+            bounds=None):
+        self.properties = list(properties)
+        self.bounds = [tuple(b) for b in bounds] if bounds else \
+                [(0., 1.)] * len(self.properties)
+        self.number_of_convergence_bins = number_of_convergence_bins
+        self.shape = (number_of_convergence_bins,) * len(self.properties)
+
+    @classmethod
+    def from_config(cls, config):
+        """Binning of a run.
+
+        Args:
+            config (dict): parameters specified in config. The optional
+                `binning` section lists `properties` (default = alpha and
+                beta) and their `bounds` (default = 0 to 1 each).
+
+        Returns:
+            binning (Binning): grid of the run.
+
+        """
+        binning = config.get('binning') or {}
+        return cls(config['number_of_convergence_bins'],
+                binning.get('properties', ('alpha', 'beta')),
+                binning.get('bounds'))
+
+    @property
+    def size(self):
+        """Number of bins in the whole grid."""
+        return int(np.prod(self.shape, dtype=np.int64))
+
+    def coordinates(self, results):
+        """Bin of each material along each property.
+
+        Args:
+            results (dict): array of each simulated property.
+
+        Returns:
+            coordinates (numpy.ndarray int): (N, number of properties) bins.
+
+        """
+        return np.column_stack([
+            calc_bins(results[name], bound_min, bound_max,
+                self.number_of_convergence_bins)
+            for name, (bound_min, bound_max) in zip(self.properties, self.bounds)])
+
+    def keys(self, coordinates):
+        """Linearize bin coordinates.
+
+        Args:
+            coordinates (numpy.ndarray int): (N, number of properties) bins.
+
+        Returns:
+            keys (numpy.ndarray int): bin key of each material.
+
+        """
+        coordinates = np.asarray(coordinates).reshape(-1, len(self.shape))
+        return np.ravel_multi_index(tuple(coordinates.T), self.shape).astype(np.int64)
+
+    def coordinate(self, key):
+        """Bin coordinates of a bin key.
+
+        Args:
+            key (int): bin key.
+
+        Returns:
+            coordinate (tuple int): bin along each property.
+
+        """
+        return tuple(int(c) for c in np.unravel_index(key, self.shape))
+
+    def columns(self, results):
+        """Bin columns of simulated materials.
+
+        Args:
+            results (dict): array of each simulated property.
+
+        Returns:
+            columns (dict): `bin_key` and the bin of each property, e.g.
+            `alpha_bin`.
+
+        """
+        coordinates = self.coordinates(results)
+        columns = {'{}_bin'.format(name): coordinates[:, i]
+                for i, name in enumerate(self.properties)}
+        columns['bin_key'] = self.keys(coordinates)
+        return columns
@@ -0,0 +1,215 @@
+from math import sqrt
+
+import numpy as np
+
+from oedipus.db import session, Box
+from oedipus.stats import count
+
+class AliasTable(object):
+    """Walker's alias table for drawing from a fixed discrete distribution.
+
+    Building the table takes time linear in the number of outcomes; each draw
+    then takes constant time, however many outcomes there are.
+
+    Attributes:
+        probability (numpy.ndarray float): chance of keeping each column's own
+            outcome rather than its alias.
+        alias (numpy.ndarray int): outcome sharing each column.
+
+    """
+    def __init__(self, weights):
+        n = len(weights)
+        scaled = np.asarray(weights, dtype=float) * n / np.sum(weights)
+        self.probability = np.ones(n)
+        self.alias = np.arange(n)
+        small = np.flatnonzero(scaled < 1.).tolist()
+        large = np.flatnonzero(scaled >= 1.).tolist()
+        scaled = scaled.tolist()
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1. - scaled[less]
+            if scaled[more] < 1.:
+                small.append(more)
+            else:
+                large.append(more)
+        # columns left over hold their own outcome, up to rounding error
+
+    def draw(self, size, rng):
+        """Draw outcomes.
+
+        Args:
+            size (int): number of draws.
+            rng (numpy.random.Generator): source of random numbers.
+
+        Returns:
+            outcomes (numpy.ndarray int): index of each outcome drawn.
+
+        """
+        columns = (rng.random(size) * len(self.alias)).astype(int)
+        keep = rng.random(size) < self.probability[columns]
+        return np.where(keep, columns, self.alias[columns])
+
+class BinCounts(object):
+    """In-memory occupancy index of the structure-property bins in one run.
+
+    The index is built once from the `boxes` table and then updated as each
+    generation is committed, so parent selection never needs to count bins in
+    the database. Running sums over the occupied bins are kept alongside, so
+    the spread of bin-counts is available in constant time. The selection
+    weights are turned into an `AliasTable` once per generation, on the first
+    draw after the counts change.
+
+    Attributes:
+        run_id (str): identification string for run.
+        counts (dict): number of materials in each occupied bin, by bin key.
+            Only occupied bins are held, however large the bin space.
+        members (dict): ids of the materials in each bin, by bin key.
+        total (int): number of materials counted.
+        sum_of_squares (int): sum of the squared count of each bin.
+
+    """
+    def __init__(self, run_id=None):
+        self.run_id = run_id
+        self.counts = {}
+        self.members = {}
+        self.total = 0
+        self.sum_of_squares = 0
+        self._selection = None
+
+    @classmethod
+    def from_database(cls, run_id, max_generation=None):
+        """Rebuild the index from every box already stored for a run.
+
+        Args:
+            run_id (str): identification string for run.
+            max_generation (int): latest generation to include (default = all
+                generations).
+
+        Returns:
+            bin_counts (BinCounts): index matching the database.
+
+        """
+        bin_counts = cls(run_id)
+        bin_counts.load(max_generation=max_generation)
+        return bin_counts
+
+    @classmethod
+    def from_population(cls, population):
+        """Build the index from materials already fetched, without a query.
+
+        Args:
+            population (Population): materials of a run.
+
+        Returns:
+            bin_counts (BinCounts): index of every material in population.
+
+        """
+        bin_counts = cls(population.run_id)
+        for box_id, key in zip(population['id'].tolist(),
+                population['bin_key'].tolist()):
+            bin_counts.add(box_id, key)
+        return bin_counts
+
+    def load(self, min_generation=None, max_generation=None):
+        """Count the boxes of a range of generations stored in the database.
+
+        Args:
+            min_generation (int): first generation to include (default = 0).
+            max_generation (int): latest generation to include (default = all
+                generations).
+
+        """
+        query = session \
+            .query(Box.id, Box.bin_key) \
+            .filter(Box.run_id == self.run_id)
+        if min_generation is not None:
+            query = query.filter(Box.generation >= min_generation)
+        if max_generation is not None:
+            query = query.filter(Box.generation <= max_generation)
+        loaded = self.total
+        for box_id, bin_key in query.order_by(Box.id):
+            self.add(box_id, bin_key)
+        count('rows_loaded', self.total - loaded)
+
+    def __len__(self):
+        return self.total
+
+    def add(self, box_id, key):
+        """Count one material in its bin.
+
+        Args:
+            box_id (int): database id of material.
+            key (int): bin key of material.
+
+        """
+        count = self.counts.get(key, 0)
+        self.counts[key] = count + 1
+        self.members.setdefault(key, []).append(box_id)
+        self.total += 1
+        self.sum_of_squares += 2 * count + 1
+        self._selection = None
+
+    def add_batch(self, batch):
+        """Count a batch of materials, after it has been inserted.
+
+        Args:
+            batch (BoxBatch): simulated materials with database ids.
+
+        """
+        for box_id, key in zip(batch['id'].tolist(), batch['bin_key'].tolist()):
+            self.add(box_id, key)
+
+    def standard_deviation(self):
+        """Spread of the bin-counts over every occupied bin.
+
+        Returns:
+            Population standard deviation(float) of the bin-counts.
+
+        """
+        occupied = len(self.counts)
+        mean = self.total / occupied
+        return sqrt(max(self.sum_of_squares / occupied - mean ** 2, 0.))
+
+    def selection_table(self):
+        """Occupied bins, their counts and an alias table over their weights.
+
+        Returns:
+            bins (list int): key of every occupied bin.
+            counts (numpy.ndarray int): count of each bin.
+            table (AliasTable): draws a bin with probability inversely
+                proportional to its count.
+
+        The table is cached until another material is counted.
+
+        """
+        if self._selection is None:
+            bins = list(self.counts)
+            counts = np.array([self.counts[b] for b in bins])
+            self._selection = bins, counts, AliasTable(1. / counts)
+        return self._selection
+
+    def select_parents(self, size, rng=None):
+        """Draw parents with a bias favoring materials in rare bins.
+
+        A bin is chosen with probability inversely proportional to its count,
+        then a material is chosen uniformly from that bin. All draws are made
+        at once, in constant time per draw.
+
+        Args:
+            size (int): number of parents to draw.
+            rng (numpy.random.Generator): source of random numbers (default =
+                a fresh, unseeded generator).
+
+        Returns:
+            parent_ids (list int): ids of the selected parent-materials.
+
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        bins, counts, table = self.selection_table()
+        chosen = table.draw(size, rng)
+        offsets = (rng.random(size) * counts[chosen]).astype(int)
+        return [self.members[bins[b]][i]
+                for b, i in zip(chosen.tolist(), offsets.tolist())]
@@ -1,243 +1,290 @@
-import sys
-from random import random
-from math import sqrt
-
 import numpy as np
 from sqlalchemy.sql import text
-from sqlalchemy import func
-
-from oedipus.db import engine, session, Box, MutationStrength
 
-def get_all_parent_ids(run_id, generation):
-    return [e[0] for e in session.query(Box.parent_id) \
-            .filter(Box.run_id == run_id, Box.generation == generation) \
-            .distinct() if e[0] != None]
+from oedipus.db import session, Box, MutationStrength
+from oedipus.bins import BinCounts
+from oedipus.population import Population
+from oedipus.batch import BoxBatch
+from oedipus.stats import phase, count
 
-def calculate_percent_children_in_bin(run_id, generation, bin_coordinate):
-    """Find the fraction of children generated by all parents from a particular
-    bin who also belong in the same bin as their parent.
+def adjust_mutation_strength(strength, fraction_in_parent_bin):
+    """Adjust a bin's mutation strength from how often its parents' children
+    stayed in the bin.
 
     Args:
-        run_id (str): run identification string.
-        generation (int): interation in overall process.
-        bin (list int): 
+        strength (float): prior mutation strength of the bin.
+        fraction_in_parent_bin (float): fraction of children in the same bin as
+            their parent.
 
     Returns:
-        Fraction of children in the same bin as their parent for all parents in
-        a particular bin.
+        strength (float): adjusted mutation strength.
+
     """
-    sql = text("""
-        select
-            m.alpha_bin,
-            m.beta_bin,
-            (
-                m.alpha_bin = p.alpha_bin and
-                m.beta_bin = p.beta_bin
-            ) as in_bin
-        from boxes m
-        join boxes p on (m.parent_id = p.id)
-        where m.generation = :gen
-            and m.run_id = :run_id
-            and p.alpha_bin = :alpha_bin
-            and p.beta_bin = :beta_bin
-        """)
-
-    rows = engine.connect().execute(
-        sql,
-        gen=generation,
-        run_id=run_id,
-        alpha_bin=bin_coordinate[0],
-        beta_bin=bin_coordinate[1]
-    ).fetchall()
-
-    return len([ r for r in rows if r.in_bin ]) / len(rows)
-
-def calculate_mutation_strength(run_id, generation, mutation_strength_bin, initial_mutation_strength):
-    """Query mutation_strength for bin and adjust as necessary.
+    if fraction_in_parent_bin < 0.1 and strength / 1.1 > 0:
+        strength /= 1.1
+    elif fraction_in_parent_bin > 0.5 and strength + 1.1 < 1:
+        strength *= 1.1
+    return strength
+
+# in-bin fraction and prior strength of every parent bin of a generation
+PARENT_BIN_FRACTIONS_SQL = text("""
+    select
+        p.bin_key,
+        count(*) as children,
+        sum(case when m.bin_key = p.bin_key then 1 else 0 end) as in_bin,
+        (
+            select s.strength
+            from mutation_strengths s
+            where s.run_id = :run_id
+                and s.bin_key = p.bin_key
+                and s.generation < :next_gen
+            order by s.generation desc
+            limit 1
+        ) as prior_strength
+    from boxes m
+    join boxes p on (m.parent_id = p.id)
+    where m.generation = :gen
+        and m.run_id = :run_id
+    group by p.bin_key
+    """)
+
+def calculate_all_mutation_strengths(run_id, gen, initial_mutation_strength):
+    """Adjust the mutation strength of every bin that parented children in a
+    generation, for use in the next generation.
 
     Args:
         run_id (str): identification string for run.
-        generation (int): iteration in bin-mutate-simulate routine.
-        parent (sqlalchemy.orm.query.Query): parent-material corresponding to
-            the bin being queried.
+        gen (int): generation whose children are counted.
+        initial_mutation_strength (float): strength of bins without history.
 
     Returns:
-        mutation_strength.strength (float): mutation strength to be used for
-        parents in the bin being queried. If the fraction of children from
-        previous generation which populate the SAME bin as their parent is LESS
-        THAN 10% then the mutation strength is REDUCED BY 5%. If the fraction
-        of these children populating the SAME bin as their parent is GREATER
-        THAN 50% then the mutation strength is INCREASED BY 5%.
+        strengths (dict): new mutation strength of each parent bin key.
+
+    One aggregate query finds, for every parent bin, the fraction of children
+    in the same bin as their parent along with the bin's prior strength; the
+    new rows are then written with one bulk upsert.
 
     """
-    mutation_strength_key = [run_id, generation, *mutation_strength_bin]
-    mutation_strength = session.query(MutationStrength).get(mutation_strength_key)
-    mutation_strength_key.append(initial_mutation_strength)
+    rows = session.execute(PARENT_BIN_FRACTIONS_SQL, {
+        'gen': gen,
+        'next_gen': gen + 1,
+        'run_id': run_id,
+    }).fetchall()
 
-    if mutation_strength:
-        pass
-    else:
-        mutation_strength = MutationStrength.get_prior(*mutation_strength_key).clone()
-        mutation_strength.generation = generation
-
-        try:
-            fraction_in_parent_bin = calculate_percent_children_in_bin(run_id, generation, mutation_strength_bin)
-            if fraction_in_parent_bin < 0.1 and mutation_strength.strength / 1.1 > 0:
-                mutation_strength.strength /= 1.1
-            elif fraction_in_parent_bin > 0.5 and mutation_strength.strength + 1.1 < 1:
-                mutation_strength.strength *= 1.1
-        except ZeroDivisionError:
-            pass
-
-        try:
-            session.add(mutation_strength)
-            session.commit()
-        except (FlushError, IntegrityError) as e:
-            print("Somebody beat us to saving a row with this generation. That's ok!")
-            session.rollback()
-            # it's ok b/c this calculation should always yield the exact same result!
-    sys.stdout.flush()
-    return mutation_strength.strength
+    strengths = {}
+    for row in rows:
+        prior_strength = row.prior_strength
+        if prior_strength is None:
+            prior_strength = initial_mutation_strength
+        strengths[row.bin_key] = adjust_mutation_strength(
+                prior_strength, row.in_bin / row.children)
 
-def calculate_all_mutation_strengths(run_id, gen, initial_mutation_strength):
-    parent_ids = get_all_parent_ids(run_id, gen)
-    ms_bins = []
-    for parent_id in parent_ids:
-        parent_bin = session.query(Box).get(parent_id).bin
-        if parent_bin not in ms_bins:
-            calculate_mutation_strength(run_id, gen + 1, parent_bin,
-                    initial_mutation_strength)
-        ms_bins.append(parent_bin)
-
-def smallest_bin_selection(run_id, max_generation, children_per_generation):
+    # rows already saved by another worker hold the exact same values
+    MutationStrength.bulk_upsert([{
+        'run_id': run_id,
+        'generation': gen + 1,
+        'bin_key': bin_key,
+        'strength': strength,
+    } for bin_key, strength in strengths.items()])
+    session.commit()
+    return strengths
+
+def smallest_bin_selection(run_id, max_generation, children_per_generation,
+        bin_counts=None, rng=None):
     """Use bin-counts to preferentially select a list of 'rare' parents.
 
     Args:
         run_id (str): identification string for run.
         max_generation (int): latest generation to include when counting number
             of materials ub each bin.
-        generation_limit (int): number of materials to query in each generation
-            (as materials are added to database they are assigned an index
-            within the generation to bound the number of materials in each
-            generation).
+        children_per_generation (int): number of parents to select.
+        bin_counts (BinCounts): in-memory index of bin-counts up to
+            max_generation. If None, the index is rebuilt from the database.
+        rng (numpy.random.Generator): source of random numbers.
 
     Returns:
-        The material id(int) corresponding to some parent-material selected
+        The material ids(list int) corresponding to parent-materials selected
         from database with a bias favoring materials in bins with the lowest
         counts.
 
     """
-    queries = [Box.alpha_bin, Box.beta_bin]
-
-    # Each bin is counted...
-    bins_and_counts = session \
-        .query(func.count(Box.id), Box.alpha_bin, Box.beta_bin) \
-        .filter(
-            Box.run_id == run_id,
-            Box.generation <= max_generation,
-        ) \
-        .group_by(Box.alpha_bin, Box.beta_bin).all()[1:]
-    bins = []
-    for i in bins_and_counts:
-        some_bin = {}
-        for j in range(len(queries)):
-            some_bin[queries[j]] = i[j + 1]
-        bins.append(some_bin)
-    total = sum([i[0] for i in bins_and_counts])
-    # ...then assigned a weight.
-    weights = [ total / float(i[0]) for i in bins_and_counts ]
-    normalized_weights = [ weight / sum(weights) for weight in weights ]
-    parent_bin = np.random.choice(bins, p = normalized_weights)
-    parent_queries = [i == parent_bin[i] for i in queries]
-    parent_query = session \
-        .query(Box.id) \
-        .filter(
-            Box.run_id == run_id,
-            *parent_queries,
-            Box.generation <= max_generation,).all()
-    potential_parents = [i[0] for i in parent_query]
-    return int(np.random.choice(potential_parents))
-
-def center_of_mass_selection(run_id, max_generation, children_per_generation):
-    filters = [Box.run_id == run_id, Box.generation <= max_generation]
-    ids = [e[0] for e in session.query(Box.id).filter(*filters).all()]
-    alpha = [e[0] for e in session.query(Box.alpha).filter(*filters).all()]
-    beta = [e[0] for e in session.query(Box.beta).filter(*filters).all()]
-    alpha_bar = sum(alpha) / len(alpha)
-    beta_bar = sum(beta) / len(beta)
-    distance = [sqrt((alpha[e] - alpha_bar) ** 2 + (beta[e] - beta_bar) ** 2) for e in range(len(alpha))]
-    weights = [e / sum(distance) for e in distance]
-    normalized_weights = [e / sum(weights) for e in weights]
-    return int(np.random.choice(ids, p = normalized_weights))
-
-def perturb_length(x, ms):
-    dx = ms * (random() - x)
-    return x + dx
-
-def mutate_box(parent_box, mutation_strength, generation):
-    """    
+    if bin_counts is None:
+        bin_counts = BinCounts.from_database(run_id, max_generation)
+    return bin_counts.select_parents(children_per_generation, rng)
+
+def center_of_mass_selection(run_id, max_generation, children_per_generation,
+        population=None, rng=None):
+    """Select parents with a bias favoring materials far from the run's
+    center of mass in alpha-beta space.
+
+    Args:
+        run_id (str): identification string for run.
+        max_generation (int): latest generation to include.
+        children_per_generation (int): number of parents to select.
+        population (Population): in-memory columns of the run up to
+            max_generation. If None, the columns are fetched from the database.
+        rng (numpy.random.Generator): source of random numbers.
+
+    Returns:
+        The material ids(list int) of the selected parent-materials.
+
+    """
+    if population is None:
+        population = Population.from_database(run_id, max_generation)
+    return population.center_of_mass_parents(children_per_generation, rng).tolist()
+
+def perturb_lengths(x, ms, rng=None):
+    """Perturb many side lengths at once.
+
     Args:
+        x (numpy.ndarray float): (N, 3) side lengths of parents.
+        ms (numpy.ndarray float): mutation strength of each parent.
+        rng (numpy.random.Generator): source of random numbers (default = a
+            fresh, unseeded generator).
 
     Returns:
+        Perturbed side lengths; each moves toward a uniform random length in
+        [0, 1) by the fraction ms.
 
     """
-    ########################################################################
-    # create box
-    child_box = Box(parent_box.run_id)
-    child_box.parent_id = parent_box.id
-    child_box.generation = generation
-
-    ########################################################################
-    # perturb side lengths
-    child_box.x = perturb_length(parent_box.x, mutation_strength)
-    child_box.y = perturb_length(parent_box.y, mutation_strength)
-    child_box.z = perturb_length(parent_box.z, mutation_strength)
-
-    return child_box
-
-def new_boxes(run_id, gen, children_per_generation, config):
-    # calculate mutation strengths, if adaptive
-    if 'adaptive' in config['mutation_scheme'] and gen > 1:
-        calculate_all_mutation_strengths(run_id, gen - 1,
-                config['initial_mutation_strength'])
-
-    boxes = []
-    for i in range(children_per_generation):
-        if config['selection_scheme'] == 'smallest_bin':
-            parent_id = smallest_bin_selection(run_id, gen - 1,
-                children_per_generation)
-        elif config['selection_scheme'] == 'center_of_mass':
-            parent_id = center_of_mass_selection(run_id, gen - 1,
-                children_per_generation)
-        elif config['selection_scheme'] == 'hybrid':
-            select = random()
-            if select < 0.5:
-                parent_id = smallest_bin_selection(run_id, gen - 1,
-                    children_per_generation)
-            else:
-                parent_id = center_of_mass_selection(run_id, gen - 1,
-                    children_per_generation)
-        else:
-            print('REVISE CONFIG, UNSUPPORTED SELECTION SCHEME.')
-        parent_box = session.query(Box).get(parent_id)
-    
-        if config['mutation_scheme'] == 'flat':
-            mutation_strength = config['initial_mutation_strength']
-        elif config['mutation_scheme'] == 'hybrid':
-            mutation_strength = np.random.choice([1., config['initial_mutation_strength']])
-        elif config['mutation_scheme'] == 'adaptive':
-            mutation_strength_key = [run_id, gen, *parent_box.bin,
-                    config['initial_mutation_strength']]
-            mutation_strength = MutationStrength.get_prior(*mutation_strength_key).clone().strength
-        elif config['mutation_scheme'] == 'hybrid_adaptive':
-            mutation_strength_key = [run_id, gen, *parent_box.bin,
-                    config['initial_mutation_strength']]
-            ms = MutationStrength.get_prior(*mutation_strength_key).clone().strength
-            mutation_strength = np.random.choice([1., ms])
+    if rng is None:
+        rng = np.random.default_rng()
+    return x + ms[:, np.newaxis] * (rng.random(x.shape) - x)
+
+def select_parents(run_id, max_generation, children_per_generation,
+        selection_scheme, bin_counts=None, population=None, rng=None):
+    """Select the parents of every child in a generation at once.
+
+    Args:
+        run_id (str): identification string for run.
+        max_generation (int): latest generation parents may come from.
+        children_per_generation (int): number of parents to select.
+        selection_scheme (str): 'smallest_bin', 'center_of_mass' or 'hybrid'.
+        bin_counts (BinCounts): in-memory index of bin-counts up to
+            max_generation.
+        population (Population): in-memory columns of the run up to
+            max_generation.
+        rng (numpy.random.Generator): source of random numbers (default = a
+            fresh, unseeded generator).
+
+    Returns:
+        parent_ids (numpy.ndarray int): one parent id per child. In the
+        'hybrid' scheme each child independently uses either selection method
+        with equal probability.
+
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    if selection_scheme == 'smallest_bin':
+        return np.array(smallest_bin_selection(run_id, max_generation,
+            children_per_generation, bin_counts, rng), dtype=int)
+    elif selection_scheme == 'center_of_mass':
+        return np.array(center_of_mass_selection(run_id, max_generation,
+            children_per_generation, population, rng), dtype=int)
+    elif selection_scheme == 'hybrid':
+        parent_ids = np.empty(children_per_generation, dtype=int)
+        by_bin = rng.random(children_per_generation) < 0.5
+        if by_bin.any():
+            parent_ids[by_bin] = smallest_bin_selection(run_id, max_generation,
+                int(by_bin.sum()), bin_counts, rng)
+        if not by_bin.all():
+            parent_ids[~by_bin] = center_of_mass_selection(run_id,
+                max_generation, int((~by_bin).sum()), population, rng)
+        return parent_ids
+    else:
+        print('REVISE CONFIG, UNSUPPORTED SELECTION SCHEME.')
+
+def select_mutation_strengths(run_id, gen, parent_keys, config, strengths=None,
+        rng=None):
+    """Determine the mutation strength used for each child in a generation.
+
+    Args:
+        run_id (str): identification string for run.
+        gen (int): generation being created.
+        parent_keys (list int): bin key of each child's parent.
+        config (dict): mutate-section of the configuration file.
+        strengths (MutationStrengthCache): current mutation strength of every
+            bin, indexed by bin key. If None, strengths are looked up in the
+            database.
+        rng (numpy.random.Generator): source of random numbers (default = a
+            fresh, unseeded generator).
+
+    Returns:
+        mutation_strengths (numpy.ndarray float): one strength per child.
+
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    n = len(parent_keys)
+    initial_mutation_strength = config['initial_mutation_strength']
+    if config['mutation_scheme'] == 'flat':
+        return np.full(n, initial_mutation_strength)
+    elif config['mutation_scheme'] == 'hybrid':
+        return rng.choice([1., initial_mutation_strength], size=n)
+    elif config['mutation_scheme'] in ('adaptive', 'hybrid_adaptive'):
+        parent_keys = np.asarray(parent_keys).tolist()
+        if strengths is None:
+            found = MutationStrength.get_priors(run_id, gen, set(parent_keys),
+                initial_mutation_strength)
+            mutation_strengths = np.array([found[k] for k in parent_keys])
         else:
-            print("REVISE CONFIG FILE, UNSUPPORTED MUTATION SCHEME.")
-    
-        # mutate material
-        box = mutate_box(parent_box, mutation_strength, gen)
-        boxes.append(box)
-    return boxes
+            mutation_strengths = strengths[parent_keys]
+        if config['mutation_scheme'] == 'hybrid_adaptive':
+            mutation_strengths = np.where(rng.random(n) < 0.5, 1.,
+                mutation_strengths)
+        return mutation_strengths
+    else:
+        print("REVISE CONFIG FILE, UNSUPPORTED MUTATION SCHEME.")
+
+def update_mutation_strengths(run_id, gen, config, strengths=None):
+    """Calculate the mutation strengths of a generation, if adaptive.
+
+    Args:
+        run_id (str): identification string for run.
+        gen (int): generation being created.
+        config (dict): mutate-section of the configuration file.
+        strengths (MutationStrengthCache): updated with the new strengths.
+
+    """
+    if 'adaptive' in config['mutation_scheme'] and gen > 1:
+        with phase('mutation_strengths'):
+            new_strengths = calculate_all_mutation_strengths(run_id, gen - 1,
+                    config['initial_mutation_strength'])
+            if strengths is not None:
+                strengths.update(new_strengths)
+
+def new_boxes(run_id, gen, children_per_generation, config, bin_counts=None,
+        population=None, strengths=None, update_strengths=True, rng=None):
+    # callers creating a generation in several batches only need to update
+    # mutation strengths once
+    if update_strengths:
+        update_mutation_strengths(run_id, gen, config, strengths)
+
+    with phase('selection'):
+        if bin_counts is None and config['selection_scheme'] in ('smallest_bin', 'hybrid'):
+            bin_counts = BinCounts.from_database(run_id, gen - 1)
+        if population is None and config['selection_scheme'] in ('center_of_mass', 'hybrid'):
+            population = Population.from_database(run_id, gen - 1)
+        if rng is None:
+            rng = np.random.default_rng()
+        parent_ids = select_parents(run_id, gen - 1, children_per_generation,
+                config['selection_scheme'], bin_counts, population, rng)
+
+        # load the columns of every parent in one query, without Box objects
+        parents_by_id = {row[0]: row[1:] for row in session \
+                .query(Box.id, Box.x, Box.y, Box.z, Box.bin_key, Box.root_id,
+                        Box.depth) \
+                .filter(Box.id.in_(set(parent_ids.tolist())))}
+        count('rows_loaded', len(parents_by_id))
+        parents = [parents_by_id[parent_id] for parent_id in parent_ids.tolist()]
+        xyz = np.array([parent[:3] for parent in parents]).reshape(-1, 3)
+        parent_keys = [parent[3] for parent in parents]
+        root_ids = [parent[4] for parent in parents]
+        depths = [parent[5] + 1 for parent in parents]
+    mutation_strengths = select_mutation_strengths(run_id, gen, parent_keys,
+            config, strengths, rng)
+
+    # mutate materials
+    x, y, z = perturb_lengths(xyz, mutation_strengths, rng).T
+    return BoxBatch(run_id, gen, x, y, z, parent_id=parent_ids,
+            root_id=root_ids, depth=depths)
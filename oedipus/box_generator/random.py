@@ -1,20 +1,20 @@
-from random import random
+import numpy as np
 
-from oedipus.db import Box
+from oedipus.batch import BoxBatch
 
-def new_boxes(run_id, gen, children_per_generation, config):
+def new_boxes(run_id, gen, children_per_generation, config, rng=None):
     """
     
     Args:
         run_id (str): identification string for run.
+        rng (numpy.random.Generator): source of random numbers (default = a
+            fresh, unseeded generator).
 
     Returns:
+        batch (BoxBatch): materials with random structural data.
  
     """
-    boxes = []
-    for i in range(children_per_generation):
-        box = Box(run_id)
-        box.generation  = gen
-        [box.x, box.y, box.z] = [random(), random(), random()]
-        boxes.append(box)
-    return boxes
+    if rng is None:
+        rng = np.random.default_rng()
+    x, y, z = rng.random((3, children_per_generation))
+    return BoxBatch(run_id, gen, x, y, z)
@@ -3,27 +3,111 @@
 # standard library imports
 import os
 from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import sessionmaker, scoped_session, Session
 import yaml
 
-# Init the database
-with open(os.path.join('settings', 'database.yaml'), 'r') as yaml_file:
-    dbconfig = yaml.load(yaml_file)
-connection_string = dbconfig['connection_string']
-if 'sqlite' in connection_string:
-    print(
-        'WARNING: attempting to use SQLite database! Okay for local debugging\n' +
-        'but will not work with multiple workers, due to lack of locking features.'
-    )
-engine = create_engine(connection_string)
-session = sessionmaker(bind=engine)()
+# engine settings passed on to `create_engine` when found in database.yaml
+POOL_SETTINGS = ['pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle',
+        'pool_pre_ping']
+
+# engine of this process, created on first use
+_engine = None
+_engine_pid = None
+
+def load_database_config(path=os.path.join('settings', 'database.yaml')):
+    """Reads database settings.
+
+    Args:
+        path (str): database config file (default = settings/database.yaml
+            relative to the working directory).
+
+    Returns:
+        dbconfig (dict): `connection_string` and optional pool settings.
+
+    """
+    with open(path, 'r') as yaml_file:
+        return yaml.safe_load(yaml_file)
+
+def get_engine(dbconfig=None):
+    """Engine of this process, created on first use.
+
+    Args:
+        dbconfig (dict): `connection_string` and optional pool settings
+            (default = settings/database.yaml). Passing a config replaces the
+            current engine.
+
+    Returns:
+        engine (sqlalchemy.engine.Engine): engine with every table created.
+
+    A process forked from one that already connected gets its own engine, so
+    pool workers never share the parent's connections.
+
+    """
+    global _engine, _engine_pid
+    if _engine is not None and _engine_pid != os.getpid():
+        # forked: drop the parent's pooled connections without closing them
+        _engine.pool = _engine.pool.recreate()
+        session.registry.clear()
+        _engine_pid = os.getpid()
+    if _engine is not None and dbconfig is None:
+        return _engine
+
+    if dbconfig is None:
+        dbconfig = load_database_config()
+    connection_string = dbconfig['connection_string']
+    if 'sqlite' in connection_string:
+        print(
+            'WARNING: attempting to use SQLite database! Okay for local debugging\n' +
+            'and a few workers on one node, which take turns on the file lock.'
+        )
+    engine = create_engine(connection_string,
+            **{k: dbconfig[k] for k in POOL_SETTINGS if k in dbconfig})
+
+    # Create tables in the engine, if they don't exist already.
+    try:
+        Base.metadata.create_all(engine)
+    except (OperationalError, ProgrammingError):
+        # another process created them since they were checked for
+        Base.metadata.create_all(engine)
+
+    if _engine is not None:
+        session.remove()
+        _engine.dispose()
+    _engine = engine
+    _engine_pid = os.getpid()
+    Base.metadata.bind = engine
+    return engine
+
+def get_session(dbconfig=None):
+    """Session of the calling thread, connected to `get_engine(dbconfig)`.
+
+    Args:
+        dbconfig (dict): `connection_string` and optional pool settings
+            (default = settings/database.yaml).
+
+    Returns:
+        session (sqlalchemy.orm.scoped_session): the module's `session`.
+
+    """
+    get_engine(dbconfig)
+    return session
+
+class LazySession(Session):
+    """Session bound to the engine of `get_engine`, created on first query."""
+
+    def get_bind(self, mapper=None, clause=None):
+        if self.bind is None:
+            return get_engine()
+        return Session.get_bind(self, mapper, clause)
+
+# Nothing connects until the session is first used.
+session = scoped_session(sessionmaker(class_=LazySession))
 
 # Import all models
 from oedipus.db.base import Base
 from oedipus.db.box import Box
 from oedipus.db.mutation_strength import MutationStrength
-
-# Create tables in the engine, if they don't exist already.
-Base.metadata.create_all(engine)
-Base.metadata.bind = engine
+from oedipus.db.generation_stat import GenerationStat
+from oedipus.db.generation_slot import GenerationSlot
+from oedipus.db.rng_state import RngState
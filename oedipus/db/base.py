@@ -1,3 +1,6 @@
+from sqlalchemy.dialects import postgresql
+
+from oedipus.db import session
 
 class Base(object):
 
@@ -30,5 +33,26 @@ class Base(object):
         for k, v in d.items():
             setattr(self, k, v)
 
+    @classmethod
+    def bulk_upsert(cls, rows):
+        """Insert many rows in one statement, skipping any row whose primary
+        key already exists.
+
+        Args:
+            cls (classmethod): class name.
+            rows (list dict): column values of each row.
+
+        """
+        if not rows:
+            return
+        dialect = session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            statement = postgresql.insert(cls.__table__).on_conflict_do_nothing()
+        elif dialect == 'sqlite':
+            statement = cls.__table__.insert().prefix_with('OR IGNORE')
+        else:
+            statement = cls.__table__.insert()
+        session.execute(statement, rows)
+
 from sqlalchemy.ext.declarative import declarative_base
 Base = declarative_base(cls=Base)
@@ -1,11 +1,12 @@
+import csv
+import io
 import sys
 import uuid
 
-from sqlalchemy import Column, ForeignKey, Integer, String, Float
-from sqlalchemy.sql import text
+from sqlalchemy import Column, ForeignKey, Integer, BigInteger, String, Float, Index
 
 #from htsohm import config
-from oedipus.db import Base, session, engine
+from oedipus.db import Base, session
 
 class Box(Base):
     """Declarative class mapping to table storing material/simulation data.
@@ -16,6 +17,9 @@ class Box(Base):
         uuid (str): unique identification string for material.
         parent_id (int): uuid of parent mutated to create material.
         generation (int): iteration in overall bin-mutate-simulate routine.
+        root_id (int): id of the generation-0 (or random) ancestor of the
+            material; its own id if it has no parent.
+        depth (int): number of mutations separating material from its root.
         generation_index (int): order material was created in generation (used
             to determine when all materials appear in database for a particular
             generation).
@@ -29,14 +33,17 @@ class Box(Base):
 
         alpha_bin (int):
         beta_bin (int):
+        bin_key (int): linearized bin coordinates, see `oedipus.binning`.
     """
     __tablename__ = 'boxes'
     # COLUMN                                                 UNITS
     id = Column(Integer, primary_key=True)                 # dimm.
-    run_id = Column(String(50), index=True)                # dimm.
+    run_id = Column(String(50))                            # dimm.
     uuid = Column(String(40))
     parent_id = Column(Integer)                            # dimm.
-    generation = Column(Integer, index=True)               # generation#
+    generation = Column(Integer)                           # generation#
+    root_id = Column(Integer)                              # dimm.
+    depth = Column(Integer)                                # mutations
 
     # structural data
     x = Column(Float)
@@ -50,6 +57,15 @@ class Box(Base):
     # bins
     alpha_bin = Column(Integer)
     beta_bin = Column(Integer)
+    bin_key = Column(BigInteger)
+
+    __table_args__ = (
+        # every hot query filters on run_id first
+        Index('ix_boxes_run_id_generation', 'run_id', 'generation'),
+        Index('ix_boxes_run_id_bin_key', 'run_id', 'bin_key'),
+        Index('ix_boxes_run_id_parent_id', 'run_id', 'parent_id'),
+        Index('ix_boxes_run_id_root_id', 'run_id', 'root_id'),
+    )
 
     def __init__(self, run_id=None, ):
         """Init material-row.
@@ -64,20 +80,78 @@ class Box(Base):
         self.uuid = str(uuid.uuid4())
         self.run_id = run_id
 
-    @property
-    def bin(self):
-        """Determine material's structure-property bin.
+    @classmethod
+    def insert_rows(cls, rows):
+        """Insert many materials at once and return their database ids.
 
         Args:
-            self (class): row in material table.
+            cls (classmethod): here Box.
+            rows (list dict): column values of new materials, all from the
+                same run and generation, each with a unique uuid.
 
         Returns:
-            The bin corresponding to a material's gas loading, void
-            fraction, and surface area data and their postion in this three-
-            dimension parameter-space.
+            ids (list int): database id of each row, in order.
+
+        Rows are written with `COPY` on PostgreSQL and with a single
+        executemany `INSERT` otherwise. Ids are then read back in one query and
+        matched to the rows by uuid.
+
+        """
+        if not rows:
+            return []
+        columns = [c.name for c in cls.__table__.columns if c.name != 'id']
+
+        connection = session.connection()
+        if connection.dialect.name == 'postgresql':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow(['' if row.get(c) is None else row[c] for c in columns])
+            buffer.seek(0)
+            cursor = connection.connection.cursor()
+            cursor.copy_expert('COPY {} ({}) FROM STDIN WITH CSV'.format(
+                cls.__tablename__, ', '.join(columns)), buffer)
+        else:
+            connection.execute(cls.__table__.insert(),
+                    [{c: row.get(c) for c in columns} for row in rows])
+
+        ids = dict(session.query(cls.uuid, cls.id).filter(
+            cls.run_id == rows[0]['run_id'],
+            cls.generation == rows[0]['generation']))
+        return [ids[row['uuid']] for row in rows]
+
+    @classmethod
+    def run_exists(cls, run_id):
+        """Whether any material of a run is stored.
+
+        Args:
+            cls (classmethod): here Box.
+            run_id (str): identification string for run.
+
+        Returns:
+            exists (bool): True if the run has materials.
+
+        """
+        return session.query(
+                session.query(cls).filter(cls.run_id == run_id).exists()).scalar()
+
+    @classmethod
+    def assign_roots(cls, run_id, generation):
+        """Make new materials without a root their own root.
+
+        Args:
+            cls (classmethod): here Box.
+            run_id (str): identification string for run.
+            generation (int): generation the materials were inserted in.
+
+        Materials without a parent are inserted before their id, and so their
+        `root_id`, is known; this sets it with one UPDATE.
 
         """
-        return [self.alpha_bin, self.beta_bin]
+        session.query(cls) \
+            .filter(cls.run_id == run_id, cls.generation == generation,
+                    cls.root_id.is_(None)) \
+            .update({cls.root_id: cls.id}, synchronize_session=False)
 
     def calculate_generation_index(self):
         """Determine material's generation-index.
@@ -98,38 +172,3 @@ class Box(Base):
                 Box.generation==self.generation,
                 Box.id < self.id,
             ).count()
-
-    def calculate_percent_children_in_bin(self):
-        """Determine number of children in the same bin as their parent.
-
-        Args:
-            self (class): row in material table.
-
-        Returns:
-            Fraction of children in the same bin as parent (self).
-        """
-        sql = text("""
-            select
-                m.alpha_bin,
-                m.beta_bin,
-                (
-                    m.alpha_bin = p.alpha_bin and
-                    m.beta_bin = p.beta_bin
-                ) as in_bin
-            from boxes m
-            join boxes p on (m.parent_id = p.id)
-            where m.generation = :gen
-                and m.run_id = :run_id
-                and p.alpha_bin = :a_bin
-                and p.beta_bin = :b_bin
-        """)
-
-        rows = engine.connect().execute(
-                sql,
-                gen=self.generation,
-                run_id=self.run_id,
-                a_bin=self.alpha_bin,
-                b_bin=self.beta_bin
-        ).fetchall()
-
-        return len([ r for r in rows if r.in_bin ]) / len(rows)
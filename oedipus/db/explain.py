@@ -0,0 +1,100 @@
+"""Check that the hot selection and mutation-strength queries use indexes.
+
+Each query is run through EXPLAIN (EXPLAIN QUERY PLAN on SQLite) and its plan
+must name one of the expected indexes. On PostgreSQL sequential scans are
+disabled for the check, so small tables don't hide a missing index:
+
+    python -m oedipus.db.explain
+
+"""
+import sys
+
+from oedipus.db import session, Box, MutationStrength
+from oedipus.box_generator.mutate import PARENT_BIN_FRACTIONS_SQL
+
+def explain(query):
+    """Query plan of an ORM query or SQL expression.
+
+    Args:
+        query: `sqlalchemy.orm.Query` or SQL expression.
+
+    Returns:
+        plan (str): lines of the query plan.
+
+    """
+    connection = session.connection()
+    statement = getattr(query, 'statement', query)
+    compiled = statement.compile(dialect=connection.dialect)
+    if compiled.positional:
+        params = tuple(compiled.params[k] for k in compiled.positiontup)
+    else:
+        params = compiled.params
+    if connection.dialect.name == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+    rows = connection.execute(prefix + str(compiled), params)
+    return '\n'.join(' '.join(str(e) for e in row) for row in rows)
+
+def hot_queries(run_id='explain', generation=1, bin_key=0):
+    """Queries run every generation, with the indexes each should use.
+
+    Returns:
+        queries (list): (name, query, expected index names) of each query.
+
+    """
+    parent_bin_fractions = PARENT_BIN_FRACTIONS_SQL.bindparams(
+            run_id=run_id, gen=generation, next_gen=generation + 1)
+    return [
+        ('generation rows',
+            session.query(Box.id, Box.bin_key).filter(
+                Box.run_id == run_id, Box.generation <= generation),
+            ['ix_boxes_run_id_generation']),
+        ('bin members',
+            session.query(Box.id).filter(
+                Box.run_id == run_id,
+                Box.bin_key == bin_key),
+            ['ix_boxes_run_id_bin_key']),
+        ('children of parent',
+            session.query(Box.id).filter(
+                Box.run_id == run_id, Box.parent_id == 1),
+            ['ix_boxes_run_id_parent_id']),
+        ('parent bin fractions', parent_bin_fractions,
+            ['ix_boxes_run_id_generation']),
+        ('parent bin prior strength', parent_bin_fractions,
+            ['ix_mutation_strengths_run_id_bin_key_generation']),
+        ('prior strength',
+            session.query(MutationStrength).filter(
+                MutationStrength.run_id == run_id,
+                MutationStrength.bin_key == bin_key,
+                MutationStrength.generation <= generation) \
+            .order_by(MutationStrength.generation.desc()).limit(1),
+            ['ix_mutation_strengths_run_id_bin_key_generation']),
+    ]
+
+def check_indexes(verbose=False):
+    """Explain every hot query and report those not using their index.
+
+    Args:
+        verbose (bool): print every query plan.
+
+    Returns:
+        failures (list str): names of queries not using an expected index.
+
+    """
+    if session.get_bind().dialect.name == 'postgresql':
+        session.execute('SET LOCAL enable_seqscan = off')
+    failures = []
+    for name, query, indexes in hot_queries():
+        plan = explain(query)
+        uses_index = any(index in plan for index in indexes)
+        print('{:30s} {}'.format(name, 'ok' if uses_index else 'NOT USING ' + ', '.join(indexes)))
+        if verbose or not uses_index:
+            print('    ' + plan.replace('\n', '\n    '))
+        if not uses_index:
+            failures.append(name)
+    session.rollback()
+    return failures
+
+if __name__ == '__main__':
+    sys.exit(1 if check_indexes('-v' in sys.argv) else 0)
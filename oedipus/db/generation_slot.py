@@ -0,0 +1,185 @@
+from datetime import datetime, timedelta
+import uuid
+
+from sqlalchemy import Column, Integer, String, DateTime, PrimaryKeyConstraint
+from sqlalchemy.sql import select, and_, or_, func
+
+from oedipus.db import Base, session
+
+class GenerationSlot(Base):
+    """Declarative class mapping to table of the units of work of each
+    generation, claimed by the workers sharing a run.
+
+    Attributes:
+        run_id (str): identification string for run.
+        generation (int): iteration in overall bin-mutate-simulate routine.
+        slot (int): index of the slot in its generation.
+        status (str): 'open', 'claimed' or 'done'.
+        worker (str): token of the claim that holds the slot.
+        claimed_at (datetime): UTC time the slot was claimed.
+    """
+    __tablename__ = 'generation_slots'
+    # COLUMN                                                 UNITS
+    run_id = Column(String(50))                            # dimm.
+    generation = Column(Integer)                           # generation
+    slot = Column(Integer)
+    status = Column(String(10))
+    worker = Column(String(40))
+    claimed_at = Column(DateTime)
+
+    __table_args__ = (
+        PrimaryKeyConstraint('run_id', 'generation', 'slot'),
+    )
+
+    @classmethod
+    def open_generation(cls, run_id, generation, number_of_slots):
+        """Create the slots of a generation, unless another worker already did.
+
+        Args:
+            cls (classmethod): here GenerationSlot.
+            run_id (str): identification string for run.
+            generation (int): iteration in bin-mutate-simulate routine.
+            number_of_slots (int): slots the generation is divided into.
+
+        """
+        cls.bulk_upsert([{
+            'run_id': run_id,
+            'generation': generation,
+            'slot': slot,
+            'status': 'open',
+        } for slot in range(number_of_slots)])
+        session.commit()
+
+    @classmethod
+    def claim(cls, run_id, generation, number_of_slots, claim_timeout):
+        """Claim open slots of a generation for this worker.
+
+        Args:
+            cls (classmethod): here GenerationSlot.
+            run_id (str): identification string for run.
+            generation (int): iteration in bin-mutate-simulate routine.
+            number_of_slots (int): most slots to claim.
+            claim_timeout (float): seconds after which a claimed slot that is
+                not done is given to another worker.
+
+        Returns:
+            token (str): identifies this claim when completing its slots.
+            slots (list int): indexes of the claimed slots; empty if none are
+                open.
+
+        The slots are claimed with one UPDATE. On PostgreSQL its subquery
+        locks the chosen rows with `FOR UPDATE SKIP LOCKED`, so concurrent
+        workers claim different slots without waiting on each other; SQLite
+        serializes writers with its file lock.
+
+        """
+        table = cls.__table__
+        token = str(uuid.uuid4())
+        now = datetime.utcnow()
+        claimable = select([table.c.slot]).where(and_(
+            table.c.run_id == run_id,
+            table.c.generation == generation,
+            or_(table.c.status == 'open', and_(
+                table.c.status == 'claimed',
+                table.c.claimed_at < now - timedelta(seconds=claim_timeout))),
+        )).order_by(table.c.slot).limit(number_of_slots)
+        if session.get_bind().dialect.name == 'postgresql':
+            claimable = claimable.with_for_update(skip_locked=True)
+
+        session.execute(table.update().where(and_(
+            table.c.run_id == run_id,
+            table.c.generation == generation,
+            table.c.slot.in_(claimable),
+        )).values(status='claimed', worker=token, claimed_at=now))
+        session.commit()
+        slots = [slot for slot, in session.query(cls.slot).filter(
+            cls.run_id == run_id,
+            cls.generation == generation,
+            cls.worker == token).order_by(cls.slot)]
+        return token, slots
+
+    @classmethod
+    def complete(cls, run_id, generation, token):
+        """Mark the slots of a claim done, in the caller's transaction.
+
+        Args:
+            cls (classmethod): here GenerationSlot.
+            run_id (str): identification string for run.
+            generation (int): iteration in bin-mutate-simulate routine.
+            token (str): returned by `claim`.
+
+        Returns:
+            Number(int) of slots marked done; fewer than were claimed if some
+            timed out and were claimed by another worker.
+
+        """
+        return session.query(cls).filter(
+            cls.run_id == run_id,
+            cls.generation == generation,
+            cls.worker == token,
+            cls.status == 'claimed',
+        ).update({'status': 'done'}, synchronize_session=False)
+
+    @classmethod
+    def release(cls, run_id, generation, token):
+        """Reopen the slots of a claim that could not be completed.
+
+        Args:
+            cls (classmethod): here GenerationSlot.
+            run_id (str): identification string for run.
+            generation (int): iteration in bin-mutate-simulate routine.
+            token (str): returned by `claim`.
+
+        """
+        session.query(cls).filter(
+            cls.run_id == run_id,
+            cls.generation == generation,
+            cls.worker == token,
+            cls.status == 'claimed',
+        ).update({'status': 'open', 'worker': None, 'claimed_at': None},
+                synchronize_session=False)
+        session.commit()
+
+    @classmethod
+    def remaining(cls, run_id, generation):
+        """Count the slots of a generation that are not done yet.
+
+        Args:
+            cls (classmethod): here GenerationSlot.
+            run_id (str): identification string for run.
+            generation (int): iteration in bin-mutate-simulate routine.
+
+        Returns:
+            Number(int) of open or claimed slots.
+
+        """
+        count = session.query(cls).filter(
+            cls.run_id == run_id,
+            cls.generation == generation,
+            cls.status != 'done').count()
+        session.commit()
+        return count
+
+    @classmethod
+    def first_open_generation(cls, run_id):
+        """Find the generation a resumed worker starts at.
+
+        Args:
+            cls (classmethod): here GenerationSlot.
+            run_id (str): identification string for run.
+
+        Returns:
+            generation (int): first generation with a slot that is not done;
+            if every slot is done, the generation after the last one (0 for a
+            new run).
+
+        """
+        generation = session.query(func.min(cls.generation)).filter(
+            cls.run_id == run_id,
+            cls.status != 'done').scalar()
+        if generation is None:
+            last = session.query(func.max(cls.generation)).filter(
+                cls.run_id == run_id).scalar()
+            generation = 0 if last is None else last + 1
+        session.commit()
+        return generation
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, Float, PrimaryKeyConstraint
+
+from oedipus.db import Base
+
+class GenerationStat(Base):
+    """Declarative class mapping to table of the time and SQL activity of each
+    phase of each generation.
+
+    Attributes:
+        run_id (str): identification string for run.
+        generation (int): iteration in overall bin-mutate-simulate routine.
+        phase (str): part of the generation, e.g. 'selection' or 'commit'.
+        seconds (float): wall time spent in the phase.
+        statements (int): SQL statements executed during the phase.
+        rows (int): rows written by those statements, as reported by the
+            database driver.
+    """
+    __tablename__ = 'generation_stats'
+    # COLUMN                                                 UNITS
+    run_id = Column(String(50))                            # dimm.
+    generation = Column(Integer)                           # generation
+    phase = Column(String(30))
+    seconds = Column(Float)                                # s
+    statements = Column(Integer)
+    rows = Column(Integer)
+
+    __table_args__ = (
+        PrimaryKeyConstraint('run_id', 'generation', 'phase'),
+    )
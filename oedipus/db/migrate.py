@@ -0,0 +1,148 @@
+"""Bring the schema of an existing database up to date with the models.
+
+`Base.metadata.create_all` only creates missing tables, so databases created
+before an index, the `bin_key` columns or the lineage columns were added need
+this once:
+
+    python -m oedipus.db.migrate [NUMBER_OF_CONVERGENCE_BINS]
+
+Rows binned before `bin_key` existed get the key of their (alpha_bin,
+beta_bin) coordinates, which needs the number of bins per property the runs
+used. Rows stored before `root_id` and `depth` existed get them from their
+chain of parents.
+
+"""
+import sys
+
+from sqlalchemy import inspect
+from sqlalchemy.sql import text
+
+from oedipus.db import get_engine, Base, MutationStrength
+
+# indexes replaced by composite indexes starting with the same column
+OBSOLETE_INDEXES = {
+    'boxes': ['ix_boxes_run_id', 'ix_boxes_generation', 'ix_boxes_run_id_bin'],
+    'mutation_strengths': ['ix_mutation_strengths_run_id_bin_generation'],
+}
+
+def add_bin_keys(bind, number_of_convergence_bins):
+    """Add `bin_key` to tables binned by alpha_bin and beta_bin.
+
+    Args:
+        bind (sqlalchemy.engine.Engine): database to migrate.
+        number_of_convergence_bins (int): bins per property of existing runs
+            (None = only add the column to `boxes`).
+
+    Returns:
+        changes (list str): description of each change made.
+
+    """
+    inspector = inspect(bind)
+    changes = []
+    with bind.begin() as connection:
+        if 'bin_key' not in {c['name'] for c in inspector.get_columns('boxes')}:
+            connection.execute('ALTER TABLE boxes ADD COLUMN bin_key BIGINT')
+            changes.append('added boxes.bin_key')
+        if number_of_convergence_bins is not None:
+            updated = connection.execute(
+                    'UPDATE boxes SET bin_key = alpha_bin * {} + beta_bin '
+                    'WHERE bin_key IS NULL'.format(int(number_of_convergence_bins)))
+            if updated.rowcount:
+                changes.append('set bin_key of {} boxes'.format(updated.rowcount))
+
+        columns = {c['name'] for c in inspector.get_columns('mutation_strengths')}
+        if 'bin_key' not in columns:
+            if number_of_convergence_bins is None:
+                changes.append('mutation_strengths needs NUMBER_OF_CONVERGENCE_BINS')
+                return changes
+            # the primary key changes, so the table is rebuilt
+            connection.execute('ALTER TABLE mutation_strengths '
+                    'RENAME TO mutation_strengths_old')
+            for name in OBSOLETE_INDEXES['mutation_strengths']:
+                connection.execute('DROP INDEX IF EXISTS {}'.format(name))
+            MutationStrength.__table__.create(connection)
+            connection.execute(
+                    'INSERT INTO mutation_strengths '
+                    '(run_id, generation, bin_key, strength) '
+                    'SELECT run_id, generation, alpha_bin * {} + beta_bin, strength '
+                    'FROM mutation_strengths_old'.format(int(number_of_convergence_bins)))
+            connection.execute('DROP TABLE mutation_strengths_old')
+            changes.append('rebuilt mutation_strengths keyed by bin_key')
+    return changes
+
+def add_lineage(bind):
+    """Add `root_id` and `depth` to `boxes` and set them on existing rows.
+
+    Args:
+        bind (sqlalchemy.engine.Engine): database to migrate.
+
+    Returns:
+        changes (list str): description of each change made.
+
+    Parents are always inserted before their children, so every chain is
+    followed in a single pass over the boxes in id order.
+
+    """
+    inspector = inspect(bind)
+    changes = []
+    with bind.begin() as connection:
+        columns = {c['name'] for c in inspector.get_columns('boxes')}
+        for name in ['root_id', 'depth']:
+            if name not in columns:
+                connection.execute('ALTER TABLE boxes ADD COLUMN {} INTEGER'.format(name))
+                changes.append('added boxes.{}'.format(name))
+        if connection.execute('SELECT COUNT(*) FROM boxes '
+                'WHERE root_id IS NULL OR depth IS NULL').scalar() == 0:
+            return changes
+
+        root_ids, depths, updates = {}, {}, []
+        for box_id, parent_id, root_id, depth in connection.execute(
+                'SELECT id, parent_id, root_id, depth FROM boxes ORDER BY id'):
+            if root_id is None or depth is None:
+                if parent_id is None:
+                    root_id, depth = box_id, 0
+                else:
+                    root_id, depth = root_ids[parent_id], depths[parent_id] + 1
+                updates.append({'id': box_id, 'root_id': root_id, 'depth': depth})
+            root_ids[box_id], depths[box_id] = root_id, depth
+        connection.execute(text(
+                'UPDATE boxes SET root_id = :root_id, depth = :depth WHERE id = :id'),
+                updates)
+        changes.append('set root_id and depth of {} boxes'.format(len(updates)))
+    return changes
+
+def migrate(bind=None, number_of_convergence_bins=None):
+    """Add bin keys and lineage, create missing indexes and drop obsolete
+    ones.
+
+    Args:
+        bind (sqlalchemy.engine.Engine): database to migrate (default =
+            `get_engine()`).
+        number_of_convergence_bins (int): bins per property of existing runs,
+            used to compute the bin keys of rows binned before `bin_key`.
+
+    Returns:
+        changes (list str): description of each change made.
+
+    """
+    if bind is None:
+        bind = get_engine()
+    changes = add_bin_keys(bind, number_of_convergence_bins)
+    changes += add_lineage(bind)
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for name in OBSOLETE_INDEXES.get(table.name, []):
+            if name in existing:
+                bind.execute('DROP INDEX {}'.format(name))
+                changes.append('dropped index {}'.format(name))
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind)
+                changes.append('created index {}'.format(index.name))
+    return changes
+
+if __name__ == '__main__':
+    bins = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    for change in migrate(number_of_convergence_bins=bins) or ['database is up to date']:
+        print(change)
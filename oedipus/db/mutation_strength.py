@@ -1,7 +1,8 @@
 import os
 
 import yaml
-from sqlalchemy import Column, ForeignKey, Integer, String, Float, Boolean, PrimaryKeyConstraint
+from sqlalchemy import Column, ForeignKey, Integer, BigInteger, String, Float, Boolean, PrimaryKeyConstraint, Index
+from sqlalchemy import and_, func
 
 from oedipus.db import Base, session
 
@@ -11,31 +12,31 @@ class MutationStrength(Base):
     Attributes:
         run_id (str): identification string for run.
         generation (int): iteration in overall bin-mutate-simulate routine.
-        alpha_bin (int):
-        beta_bin (int):
+        bin_key (int): linearized bin coordinates, see `oedipus.binning`.
     """
     __tablename__ = 'mutation_strengths'
     # COLUMN                                                 UNITS
     run_id = Column(String(50))                            # dimm.
     generation = Column(Integer)                           # generation
-    alpha_bin = Column(Integer)
-    beta_bin = Column(Integer)
+    bin_key = Column(BigInteger)
     strength = Column(Float)
 
     __table_args__ = (
-        PrimaryKeyConstraint('run_id', 'generation', 'alpha_bin', 'beta_bin'),
+        PrimaryKeyConstraint('run_id', 'generation', 'bin_key'),
+        # latest strength of a bin: get_prior, get_priors
+        Index('ix_mutation_strengths_run_id_bin_key_generation',
+            'run_id', 'bin_key', 'generation'),
     )
 
-    def __init__(self, run_id=None, generation=None, alpha_bin=None,
-                 beta_bin=None, strength=None):
+    def __init__(self, run_id=None, generation=None, bin_key=None,
+                 strength=None):
         self.run_id = run_id
         self.generation = generation
-        self.alpha_bin = alpha_bin
-        self.beta_bin = beta_bin
+        self.bin_key = bin_key
         self.strength = strength
 
     @classmethod
-    def get_prior(cls, run_id, generation, alpha_bin, beta_bin, initial_mutation_strength):
+    def get_prior(cls, run_id, generation, bin_key, initial_mutation_strength):
         """
         Looks for the most recent mutation_strength row. If a row doesn't exist
         for this bin, the default value is used from the configuration file.
@@ -54,8 +55,7 @@ class MutationStrength(Base):
         ms = session.query(MutationStrength) \
                 .filter(
                     MutationStrength.run_id == run_id,
-                    MutationStrength.alpha_bin == alpha_bin,
-                    MutationStrength.beta_bin == beta_bin,
+                    MutationStrength.bin_key == bin_key,
                     MutationStrength.generation <= generation) \
                 .order_by(MutationStrength.generation.desc()) \
                 .first()
@@ -63,4 +63,46 @@ class MutationStrength(Base):
         if ms:
             return ms
         else:
-            return MutationStrength(run_id, generation, alpha_bin, beta_bin, initial_mutation_strength)
+            return MutationStrength(run_id, generation, bin_key, initial_mutation_strength)
+
+    @classmethod
+    def get_priors(cls, run_id, generation, bins, initial_mutation_strength):
+        """
+        Looks up the most recent mutation_strength for many bins in a single
+        query. Bins without a row use the default value from the configuration
+        file, as in `get_prior`.
+
+        Args:
+            cls (classmethod): here MutationStrength.__init__ .
+            run_id (str): identification string for run.
+            generation (int): latest generation to consider (None = all).
+            bins (list int): bin key of each bin to look up (None = every bin
+                with a row).
+            initial_mutation_strength (float): default mutation strength.
+
+        Returns:
+            strengths (dict): mutation strength of each bin key.
+
+        """
+        filters = [MutationStrength.run_id == run_id]
+        if generation is not None:
+            filters.append(MutationStrength.generation <= generation)
+        latest = session \
+                .query(
+                    MutationStrength.bin_key,
+                    func.max(MutationStrength.generation).label('generation')) \
+                .filter(*filters) \
+                .group_by(MutationStrength.bin_key) \
+                .subquery()
+
+        rows = session \
+                .query(MutationStrength.bin_key, MutationStrength.strength) \
+                .join(latest, and_(
+                    MutationStrength.bin_key == latest.c.bin_key,
+                    MutationStrength.generation == latest.c.generation)) \
+                .filter(MutationStrength.run_id == run_id)
+
+        found = dict(rows.all())
+        if bins is None:
+            return found
+        return {b: found.get(b, initial_mutation_strength) for b in bins}
@@ -0,0 +1,72 @@
+import json
+
+import numpy as np
+from sqlalchemy import Column, Integer, String, Text, PrimaryKeyConstraint
+
+from oedipus.db import Base, session
+
+class RngState(Base):
+    """Declarative class mapping to table of the random number generator state
+    of a run after each committed generation, so it can be resumed.
+
+    Attributes:
+        run_id (str): identification string for run.
+        generation (int): last generation created with the generator.
+        state (str): JSON of `numpy.random.Generator.bit_generator.state`.
+    """
+    __tablename__ = 'rng_states'
+    # COLUMN                                                 UNITS
+    run_id = Column(String(50))                            # dimm.
+    generation = Column(Integer)                           # generation
+    state = Column(Text)
+
+    __table_args__ = (
+        PrimaryKeyConstraint('run_id', 'generation'),
+    )
+
+    @classmethod
+    def save(cls, run_id, generation, rng):
+        """Record the state of a generator. Nothing is committed, so call this
+        in the transaction committing the generation.
+
+        Args:
+            cls (classmethod): here RngState.
+            run_id (str): identification string for run.
+            generation (int): last generation created with rng.
+            rng (numpy.random.Generator): generator of the run.
+
+        """
+        cls.bulk_upsert([{
+            'run_id': run_id,
+            'generation': generation,
+            'state': json.dumps(rng.bit_generator.state),
+        }])
+
+    @classmethod
+    def load(cls, run_id, generation, seed=None):
+        """Restore the generator of a run as it was after a generation.
+
+        Args:
+            cls (classmethod): here RngState.
+            run_id (str): identification string for run.
+            generation (int): last generation created with the generator.
+            seed (int): seed of the run, used if no state was recorded.
+
+        Returns:
+            rng (numpy.random.Generator): generator continuing where the run
+            left off. Runs without a recorded state continue with a generator
+            seeded with (seed, generation + 1), or an unseeded one.
+
+        """
+        state = session.query(cls.state) \
+            .filter(cls.run_id == run_id, cls.generation == generation) \
+            .scalar()
+        if state is None:
+            print('No random number generator state saved for generation {}; '
+                    'reseeding.'.format(generation))
+            return np.random.default_rng(
+                    None if seed is None else [seed, generation + 1])
+        state = json.loads(state)
+        rng = np.random.Generator(getattr(np.random, state['bit_generator'])())
+        rng.bit_generator.state = state
+        return rng
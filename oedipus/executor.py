@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+import os
+
+class SerialExecutor(object):
+    """Executor running every task in the calling process, in order."""
+
+    def map(self, fn, *iterables, chunksize=1):
+        return map(fn, *iterables)
+
+    def shutdown(self, wait=True):
+        pass
+
+def get_executor(config):
+    """Create the executor used to simulate a generation's materials.
+
+    Args:
+        config (dict): parameters specified in config. `executor` selects
+            'serial' (default), 'thread' or 'process'; `number_of_workers`
+            sets the pool size (default = number of CPUs).
+
+    Returns:
+        executor: object with the `map` and `shutdown` methods of
+        `concurrent.futures.Executor`.
+
+    """
+    executor = config.get('executor', 'serial')
+    workers = config.get('number_of_workers') or os.cpu_count()
+    if executor == 'serial':
+        return SerialExecutor()
+    elif executor == 'thread':
+        return ThreadPoolExecutor(max_workers=workers)
+    elif executor == 'process':
+        # spawned workers never share the parent's open database connections
+        return ProcessPoolExecutor(max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'))
+    else:
+        raise ValueError("Unsupported executor: {}".format(executor))
+
+def number_of_chunks(executor, tasks):
+    """Choose how many pieces to split a batch of tasks into.
+
+    Args:
+        executor: executor returned by `get_executor`.
+        tasks (int): number of tasks in the batch.
+
+    Returns:
+        chunks (int): one chunk for serial executors, otherwise about four
+        chunks per worker.
+
+    """
+    if isinstance(executor, SerialExecutor):
+        return 1
+    return max(1, min(tasks, 4 * executor._max_workers))
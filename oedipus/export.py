@@ -0,0 +1,139 @@
+"""Export a run to one `.npy` file per column, for analysis without the database.
+
+    python dps.py export RUN_ID --output DIRECTORY
+
+writes `boxes/<column>.npy` and `mutation_strengths/<column>.npy` under
+DIRECTORY, and `manifest.yaml` describing them. Columns can be loaded without
+reading them into memory:
+
+    boxes = load_export(DIRECTORY)['boxes']     # memory-mapped arrays
+    alpha = boxes['alpha'][boxes['generation'] == 10]
+
+"""
+from datetime import datetime
+import os
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.sql import func
+import yaml
+
+from oedipus.db import session, Box, MutationStrength
+from oedipus.population import Population
+
+def table_columns():
+    """Columns exported from each table, with their types.
+
+    Returns:
+        tables (dict): for each table, (name, sqlalchemy column, numpy dtype)
+        of each column. Boxes without a parent get a `parent_id` of -1.
+
+    """
+    boxes = [(name, getattr(Box, name), dtype)
+            for name, dtype in Population.dtypes.items()]
+    boxes[[name for name, _, _ in boxes].index('parent_id')] = \
+            ('parent_id', func.coalesce(Box.parent_id, -1), np.int64)
+    strengths = [
+        ('generation', MutationStrength.generation, np.int32),
+        ('bin_key', MutationStrength.bin_key, np.int64),
+        ('strength', MutationStrength.strength, np.float64),
+    ]
+    return {
+        'boxes': (boxes, Box.run_id, [Box.id]),
+        'mutation_strengths': (strengths, MutationStrength.run_id,
+                [MutationStrength.generation, MutationStrength.bin_key]),
+    }
+
+def export_table(run_id, directory, columns, run_column, order_by, chunk_size):
+    """Stream the rows of one run from a table into one `.npy` file per column.
+
+    Args:
+        run_id (str): identification string for run.
+        directory (str): directory the files are written to.
+        columns (list): (name, sqlalchemy column, numpy dtype) of each column.
+        run_column: the table's run_id column.
+        order_by (list): columns the rows are written in order of.
+        chunk_size (int): rows fetched and written at a time.
+
+    Returns:
+        rows (int): number of rows written.
+
+    The number of rows is counted first, so each file is created at its full
+    size and filled in place; only one chunk is held in memory. Rows are
+    fetched with a server-side cursor where the database supports one. Rows
+    stored after they are counted, by a run still in progress, come last in
+    order and are left out.
+
+    """
+    os.makedirs(directory, exist_ok=True)
+    rows = session.query(func.count()).filter(run_column == run_id).scalar()
+    arrays = [np.lib.format.open_memmap(os.path.join(directory, name + '.npy'),
+            mode='w+', dtype=dtype, shape=(rows,)) for name, _, dtype in columns]
+
+    query = select([column for _, column, _ in columns]) \
+        .where(run_column == run_id) \
+        .order_by(*order_by) \
+        .limit(rows) \
+        .execution_options(stream_results=True)
+    result = session.execute(query)
+    start = 0
+    while True:
+        chunk = result.fetchmany(chunk_size)
+        if not chunk:
+            break
+        for array, values in zip(arrays, zip(*chunk)):
+            array[start:start + len(chunk)] = values
+        start += len(chunk)
+    result.close()
+
+    for array in arrays:
+        array.flush()
+    return start
+
+def export_run(run_id, directory, chunk_size=10000):
+    """Export every box and mutation strength of a run.
+
+    Args:
+        run_id (str): identification string for run.
+        directory (str): directory the files and manifest are written to.
+        chunk_size (int): rows fetched and written at a time.
+
+    Returns:
+        manifest (dict): run_id, time of export and, for each table, its
+        number of rows and the file and dtype of each column.
+
+    """
+    manifest = {'run_id': run_id, 'exported': datetime.now().isoformat(),
+            'tables': {}}
+    for table, (columns, run_column, order_by) in table_columns().items():
+        table_directory = os.path.join(directory, table)
+        rows = export_table(run_id, table_directory, columns, run_column,
+                order_by, chunk_size)
+        manifest['tables'][table] = {
+            'rows': rows,
+            'columns': {name: {'file': os.path.join(table, name + '.npy'),
+                    'dtype': np.dtype(dtype).name} for name, _, dtype in columns},
+        }
+
+    with open(os.path.join(directory, 'manifest.yaml'), 'w') as manifest_file:
+        yaml.safe_dump(manifest, manifest_file, default_flow_style=False)
+    return manifest
+
+def load_export(directory, mmap_mode='r'):
+    """Load the columns of an exported run.
+
+    Args:
+        directory (str): directory written by `export_run`.
+        mmap_mode (str): passed to `numpy.load`; 'r' (default) maps the files
+            read-only instead of reading them.
+
+    Returns:
+        tables (dict): for each table, a dict of arrays by column name.
+
+    """
+    with open(os.path.join(directory, 'manifest.yaml')) as manifest_file:
+        manifest = yaml.safe_load(manifest_file)
+    return {table: {name: np.load(os.path.join(directory, column['file']),
+                    mmap_mode=mmap_mode)
+                for name, column in description['columns'].items()}
+            for table, description in manifest['tables'].items()}
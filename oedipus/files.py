@@ -13,5 +13,5 @@ def load_config_file(file_name):
 
     """
     with open(file_name) as config_file:
-         config = yaml.load(config_file)
+         config = yaml.safe_load(config_file)
     return config
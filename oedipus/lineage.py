@@ -0,0 +1,269 @@
+import numpy as np
+from sqlalchemy.sql import text, bindparam, func
+
+from oedipus.db import session, Box
+
+ANCESTORS_SQL = text("""
+    with recursive chain(id, ancestor_id, distance) as (
+        select id, parent_id, 1
+        from boxes
+        where run_id = :run_id and id in :ids and parent_id is not null
+      union all
+        select c.id, b.parent_id, c.distance + 1
+        from chain c
+        join boxes b on (b.id = c.ancestor_id)
+        where b.parent_id is not null and c.distance < :max_distance
+    )
+    select id, ancestor_id, distance from chain
+    order by id, distance
+    """).bindparams(bindparam('ids', expanding=True))
+
+DESCENDANTS_SQL = text("""
+    with recursive tree(id, descendant_id, distance) as (
+        select parent_id, id, 1
+        from boxes
+        where run_id = :run_id and parent_id in :ids
+      union all
+        select t.id, b.id, t.distance + 1
+        from tree t
+        join boxes b on (b.run_id = :run_id and b.parent_id = t.descendant_id)
+        where t.distance < :max_distance
+    )
+    select id, descendant_id, distance from tree
+    order by id, distance, descendant_id
+    """).bindparams(bindparam('ids', expanding=True))
+
+class Lineage(object):
+    """Family tree of one run, held as adjacency arrays.
+
+    Each material's parent is stored as a row, and its children as a slice of
+    one array sorted by parent, so ancestors and descendants of any number of
+    materials are found one generation at a time with array operations. The
+    `root_id` and `depth` of each material are stored when it is inserted,
+    so neither needs a walk up the tree.
+
+    Attributes:
+        ids (numpy.ndarray int): id of each material, in ascending order.
+        parents (numpy.ndarray int): row of each material's parent, or -1.
+        root_id (numpy.ndarray int): id of each material's root.
+        depth (numpy.ndarray int): mutations separating each material from
+            its root.
+        bin_key (numpy.ndarray int): bin of each material.
+
+    """
+    columns = ['id', 'parent_id', 'root_id', 'depth', 'bin_key']
+
+    def __init__(self, population):
+        """Build the tree.
+
+        Args:
+            population: `Population`, or dict of arrays, with the `columns`
+                of every material in a run. `MemoryRun.population`, where
+                ids are rows, also works.
+
+        """
+        self.ids = population['id']
+        parent_ids = population['parent_id']
+        self.parents = np.where(parent_ids < 0, -1,
+                np.searchsorted(self.ids, parent_ids))
+        self.root_id = population['root_id']
+        self.depth = population['depth']
+        self.bin_key = population['bin_key']
+
+        # children of row r are children[offsets[r]:offsets[r + 1]]
+        has_parent = np.flatnonzero(self.parents >= 0)
+        order = np.argsort(self.parents[has_parent], kind='stable')
+        self.children = has_parent[order]
+        self.offsets = np.searchsorted(self.parents[self.children],
+                np.arange(len(self.ids) + 1))
+
+    @classmethod
+    def from_database(cls, run_id, max_generation=None):
+        """Load the family tree of a run with one query.
+
+        Args:
+            run_id (str): identification string for run.
+            max_generation (int): latest generation to include (default = all
+                generations).
+
+        Returns:
+            lineage (Lineage): tree of every material stored for run.
+
+        """
+        query = session \
+            .query(Box.id, func.coalesce(Box.parent_id, -1), Box.root_id,
+                    Box.depth, Box.bin_key) \
+            .filter(Box.run_id == run_id)
+        if max_generation is not None:
+            query = query.filter(Box.generation <= max_generation)
+        rows = query.order_by(Box.id).all()
+        return cls({name: np.array(column, dtype=np.int64) for name, column in
+                zip(cls.columns, zip(*rows) if rows else [()] * len(cls.columns))})
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows(self, ids):
+        """Rows of materials.
+
+        Args:
+            ids (list int): ids of materials in the tree.
+
+        Returns:
+            rows (numpy.ndarray int): row of each material.
+
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        rows = np.searchsorted(self.ids, ids)
+        if len(ids) and (rows.max() >= len(self.ids) or
+                np.any(self.ids[rows] != ids)):
+            raise KeyError('ids not in lineage: {}'.format(
+                    sorted(set(ids.tolist()) - set(self.ids.tolist()))))
+        return rows
+
+    def ancestors(self, ids, max_distance=None):
+        """Ancestors of many materials.
+
+        Args:
+            ids (list int): ids of materials.
+            max_distance (int): furthest generation back to include (default
+                = back to the root).
+
+        Returns:
+            ids (numpy.ndarray int): id of the material of each pair.
+            ancestor_ids (numpy.ndarray int): id of an ancestor.
+            distances (numpy.ndarray int): generations between the two; 1 for
+            the parent.
+
+        Pairs are ordered by material, then by distance.
+
+        """
+        rows = self.rows(ids)
+        current = self.parents[rows]
+        pairs = []
+        distance = 1
+        while len(rows) and (max_distance is None or distance <= max_distance):
+            found = current >= 0
+            rows, current = rows[found], current[found]
+            pairs.append((rows, current, np.full(len(rows), distance)))
+            current = self.parents[current]
+            distance += 1
+        return self._pairs(pairs)
+
+    def descendants(self, ids, max_distance=None):
+        """Descendants of many materials.
+
+        Args:
+            ids (list int): ids of materials.
+            max_distance (int): furthest generation down to include (default
+                = every descendant).
+
+        Returns:
+            ids (numpy.ndarray int): id of the material of each pair.
+            descendant_ids (numpy.ndarray int): id of a descendant.
+            distances (numpy.ndarray int): generations between the two; 1 for
+            children.
+
+        Pairs are ordered by material, then by distance.
+
+        """
+        origins = self.rows(ids)
+        current = origins
+        pairs = []
+        distance = 1
+        while len(current) and (max_distance is None or distance <= max_distance):
+            starts = self.offsets[current]
+            counts = self.offsets[current + 1] - starts
+            # concatenate the slices of children of every current row
+            first = np.cumsum(counts) - counts
+            slots = np.repeat(starts - first, counts) + np.arange(counts.sum())
+            origins, current = np.repeat(origins, counts), self.children[slots]
+            pairs.append((origins, current, np.full(len(current), distance)))
+            distance += 1
+        return self._pairs(pairs)
+
+    def _pairs(self, pairs):
+        if not pairs:
+            return (np.empty(0, dtype=np.int64),) * 3
+        rows, relatives, distances = (np.concatenate(c) for c in zip(*pairs))
+        order = np.lexsort((self.ids[relatives], distances, self.ids[rows]))
+        return self.ids[rows][order], self.ids[relatives][order], distances[order]
+
+    def root_counts(self, bin_keys=None):
+        """Number of materials descending from each root, in each bin.
+
+        Args:
+            bin_keys (list int): bins to count (default = every bin).
+
+        Returns:
+            bin_keys (numpy.ndarray int): bin of each count.
+            root_ids (numpy.ndarray int): root of each count.
+            counts (numpy.ndarray int): materials of that root in that bin.
+
+        Counts are ordered by bin, then from the most to the least common
+        root, showing which lineages dominate a bin.
+
+        """
+        rows = np.arange(len(self.ids))
+        if bin_keys is not None:
+            rows = rows[np.isin(self.bin_key, bin_keys)]
+        pairs, counts = np.unique(np.column_stack(
+                [self.bin_key[rows], self.root_id[rows]]).reshape(-1, 2),
+                axis=0, return_counts=True)
+        order = np.lexsort((pairs[:, 1], -counts, pairs[:, 0]))
+        return pairs[order, 0], pairs[order, 1], counts[order]
+
+def query_ancestors(run_id, ids, max_distance=None):
+    """Ancestors of many materials, found in the database.
+
+    Args:
+        run_id (str): identification string for run.
+        ids (list int): ids of materials.
+        max_distance (int): furthest generation back to include (default =
+            back to the root).
+
+    Returns:
+        Arrays of ids, ancestor_ids and distances, as `Lineage.ancestors`.
+
+    On PostgreSQL the chains are followed by a recursive query; otherwise the
+    run's `Lineage` is loaded. Load a `Lineage` once to answer many queries.
+
+    """
+    if session.connection().dialect.name != 'postgresql':
+        return Lineage.from_database(run_id).ancestors(ids, max_distance)
+    return _query_pairs(ANCESTORS_SQL, run_id, ids, max_distance)
+
+def query_descendants(run_id, ids, max_distance=None):
+    """Descendants of many materials, found in the database.
+
+    Args:
+        run_id (str): identification string for run.
+        ids (list int): ids of materials.
+        max_distance (int): furthest generation down to include (default =
+            every descendant).
+
+    Returns:
+        Arrays of ids, descendant_ids and distances, as
+        `Lineage.descendants`.
+
+    On PostgreSQL the tree is followed by a recursive query using the
+    (run_id, parent_id) index; otherwise the run's `Lineage` is loaded.
+
+    """
+    if session.connection().dialect.name != 'postgresql':
+        return Lineage.from_database(run_id).descendants(ids, max_distance)
+    return _query_pairs(DESCENDANTS_SQL, run_id, ids, max_distance)
+
+def _query_pairs(sql, run_id, ids, max_distance):
+    ids = [int(i) for i in ids]
+    if not ids:
+        return (np.empty(0, dtype=np.int64),) * 3
+    rows = session.execute(sql, {
+        'run_id': run_id,
+        'ids': ids,
+        'max_distance': np.iinfo(np.int32).max if max_distance is None
+                else max_distance,
+    }).fetchall()
+    if not rows:
+        return (np.empty(0, dtype=np.int64),) * 3
+    return tuple(np.array(column, dtype=np.int64) for column in zip(*rows))
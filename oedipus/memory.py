@@ -0,0 +1,223 @@
+import numpy as np
+
+from oedipus.db import session, MutationStrength, RngState
+from oedipus.batch import BoxBatch
+from oedipus.bins import BinCounts
+from oedipus.population import Population
+from oedipus.binning import Binning
+from oedipus.strengths import MutationStrengthCache
+from oedipus.stats import phase
+from oedipus.box_generator.mutate import select_parents, \
+        select_mutation_strengths, perturb_lengths, adjust_mutation_strength
+
+class MemoryRun(object):
+    """State of a run held entirely in NumPy arrays, checkpointed to the
+    database.
+
+    Materials are identified by their row in `population`, in its `id`,
+    `parent_id` and `root_id` columns; database ids are only assigned at
+    checkpoints.
+
+    Attributes:
+        run_id (str): identification string for run.
+        config (dict): parameters specified in config.
+        binning (Binning): grid of the run.
+        initial_mutation_strength (float): strength of bins without history.
+        population (Population): every material in the run.
+        bin_counts (BinCounts): occupancy of each bin, by row.
+        strengths (MutationStrengthCache): current mutation strength of every
+            bin.
+        db_ids (numpy.ndarray int): database id of each checkpointed row.
+        pending_strengths (list dict): mutation_strengths rows not yet
+            checkpointed.
+        next_generation (int): first generation not yet created.
+        rng (numpy.random.Generator): every random draw of the run, seeded
+            with the config's `seed`.
+
+    """
+    def __init__(self, run_id, config):
+        self.run_id = run_id
+        self.config = config
+        self.binning = Binning.from_config(config)
+        self.population = Population(run_id)
+        self.bin_counts = BinCounts(run_id)
+        self.initial_mutation_strength = config.get('mutate', {}) \
+                .get('initial_mutation_strength', 1.)
+        self.strengths = MutationStrengthCache(run_id, self.initial_mutation_strength)
+        self.db_ids = np.empty(0, dtype=np.int64)
+        self.pending_strengths = []
+        self.next_generation = 0
+        self.rng = np.random.default_rng(config.get('seed'))
+
+    @classmethod
+    def from_database(cls, run_id, config):
+        """Restore a run from its last checkpoint, with one query for the
+        materials, one for the mutation strengths and one for the random number
+        generator.
+
+        Args:
+            run_id (str): identification string for run.
+            config (dict): parameters specified in config.
+
+        Returns:
+            run (MemoryRun): state as of the last checkpointed generation.
+
+        """
+        run = cls(run_id, config)
+        population = Population.from_database(run_id)
+        if len(population) == 0:
+            return run
+
+        # switch from database ids to rows
+        run.db_ids = population['id'].copy()
+        parent_ids = population['parent_id']
+        parent_ids[:] = np.where(parent_ids < 0, -1,
+                np.searchsorted(run.db_ids, parent_ids))
+        population['root_id'][:] = np.searchsorted(run.db_ids, population['root_id'])
+        population['id'][:] = np.arange(len(population))
+
+        run.population = population
+        run.bin_counts = BinCounts.from_population(population)
+        run.next_generation = int(population['generation'].max()) + 1
+        run.rng = RngState.load(run_id, run.next_generation - 1, config.get('seed'))
+
+        run.strengths = MutationStrengthCache.from_database(run_id,
+                run.initial_mutation_strength)
+        return run
+
+    def generation_rows(self, generation):
+        """Rows of one generation. Generations are stored in order.
+
+        Args:
+            generation (int): iteration in bin-mutate-simulate routine.
+
+        Returns:
+            rows (numpy.ndarray int): rows in population.
+
+        """
+        generations = self.population['generation']
+        return np.arange(np.searchsorted(generations, generation, 'left'),
+                np.searchsorted(generations, generation, 'right'))
+
+    def update_mutation_strengths(self, generation):
+        """Adjust the mutation strength of every bin that parented children in
+        the previous generation, as `calculate_all_mutation_strengths` does.
+
+        Args:
+            generation (int): generation about to be created.
+
+        """
+        population = self.population
+        children = self.generation_rows(generation - 1)
+        parents = population['parent_id'][children]
+        children = children[parents >= 0]
+        parents = parents[parents >= 0]
+
+        parent_keys = population['bin_key'][parents]
+        child_keys = population['bin_key'][children]
+        # count over the occupied parent bins only, however large the bin space
+        keys, inverse = np.unique(parent_keys, return_inverse=True)
+        totals = np.bincount(inverse, minlength=len(keys))
+        stays = np.bincount(inverse, weights=child_keys == parent_keys,
+                minlength=len(keys))
+
+        for key, total, stay in zip(keys.tolist(), totals.tolist(), stays.tolist()):
+            strength = adjust_mutation_strength(self.strengths.get(key), stay / total)
+            self.strengths[key] = strength
+            self.pending_strengths.append({
+                'run_id': self.run_id,
+                'generation': generation,
+                'bin_key': key,
+                'strength': strength})
+
+    def new_children(self, generation):
+        """Create the structural data of a generation.
+
+        Args:
+            generation (int): generation being created.
+
+        Returns:
+            children (dict): arrays of x, y, z, parent_id (row of parent, or
+            -1), root_id (row of root, or -1 without a parent) and depth.
+
+        """
+        n = self.config['children_per_generation']
+        if generation == 0 or self.config['generator_type'] == 'random':
+            # same draws as box_generator.random.new_boxes
+            xyz = self.rng.random((3, n)).T
+            parents = np.full(n, -1)
+            roots = parents
+            depths = np.zeros(n, dtype=int)
+        else:
+            mutate_config = self.config['mutate']
+            if 'adaptive' in mutate_config['mutation_scheme'] and generation > 1:
+                with phase('mutation_strengths'):
+                    self.update_mutation_strengths(generation)
+            population = self.population
+            with phase('selection'):
+                parents = select_parents(self.run_id, generation - 1, n,
+                        mutate_config['selection_scheme'], self.bin_counts, population,
+                        self.rng)
+            mutation_strengths = select_mutation_strengths(self.run_id,
+                    generation, population['bin_key'][parents], mutate_config,
+                    self.strengths, self.rng)
+            xyz = perturb_lengths(np.column_stack([population[c][parents]
+                    for c in 'xyz']), mutation_strengths, self.rng)
+            roots = population['root_id'][parents]
+            depths = population['depth'][parents] + 1
+        return {'x': xyz[:, 0], 'y': xyz[:, 1], 'z': xyz[:, 2], 'parent_id': parents,
+                'root_id': roots, 'depth': depths}
+
+    def add_generation(self, generation, children):
+        """Store a simulated generation.
+
+        Args:
+            generation (int): generation being added.
+            children (dict): arrays of x, y, z, parent_id, root_id, depth,
+                the simulated properties and their bins, as returned by
+                `simulate_arrays`.
+
+        """
+        n = len(children['x'])
+        rows = np.arange(len(self.population), len(self.population) + n)
+        # bin columns of properties that are not binned stay 0
+        columns = dict.fromkeys(Population.dtypes, 0)
+        columns.update(children, id=rows, generation=generation,
+                root_id=np.where(children['root_id'] < 0, rows, children['root_id']))
+        self.population.append(**columns)
+        for row, key in zip(rows.tolist(), children['bin_key'].tolist()):
+            self.bin_counts.add(row, key)
+        self.next_generation = generation + 1
+
+    def checkpoint(self):
+        """Write every material and mutation strength created since the last
+        checkpoint, and the state of the random number generator, to the
+        database in one transaction.
+        """
+        population = self.population
+        flushed = len(self.db_ids)
+        self.db_ids = np.concatenate([self.db_ids,
+                np.full(len(population) - flushed, -1, dtype=np.int64)])
+
+        for generation in np.unique(population['generation'][flushed:]).tolist():
+            rows = self.generation_rows(generation)
+            parents = population['parent_id'][rows]
+            roots = population['root_id'][rows]
+            # materials without a parent are given their root id on insert
+            batch = BoxBatch(self.run_id, generation, population['x'][rows],
+                    population['y'][rows], population['z'][rows],
+                    parent_id=np.where(parents < 0, -1, self.db_ids[parents]),
+                    root_id=np.where(roots == rows, -1, self.db_ids[roots]),
+                    depth=population['depth'][rows])
+            batch.update({c: population[c][rows] for c in
+                    ['alpha', 'beta', 'alpha_bin', 'beta_bin', 'bin_key']})
+            batch.insert()
+            self.db_ids[rows] = batch['id']
+
+        if self.pending_strengths:
+            session.execute(MutationStrength.__table__.insert(),
+                    self.pending_strengths)
+        if self.next_generation > 0:
+            RngState.save(self.run_id, self.next_generation - 1, self.rng)
+        session.commit()
+        self.pending_strengths = []
@@ -1,12 +1,15 @@
 import os
 import sys
-from math import sqrt
 from datetime import datetime
-from collections import Counter
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 import random
+import time
+import uuid
+from types import SimpleNamespace
 
 import numpy as np
-from sqlalchemy.sql import func, or_
+from sqlalchemy.sql import or_
 from sqlalchemy.orm.exc import FlushError
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.sql import text
@@ -14,7 +17,15 @@ import yaml
 
 import oedipus
 from oedipus.files import load_config_file
-from oedipus.db import engine, session, Box, MutationStrength
+from oedipus.db import session, Box, MutationStrength, GenerationSlot, RngState
+from oedipus.bins import BinCounts
+from oedipus.population import Population
+from oedipus.binning import Binning
+from oedipus.memory import MemoryRun
+from oedipus.strengths import MutationStrengthCache
+from oedipus.simulation_cache import SimulationCache
+from oedipus.stats import StatsRecorder, phase, end_generation
+from oedipus.executor import get_executor, number_of_chunks
 from oedipus import simulation
 from oedipus import box_generator
 
@@ -33,91 +44,525 @@ def boxes_in_generation(run_id, generation):
         Box.generation == generation
     ).count()
 
-def calc_bin(value, bound_min, bound_max, bins):
-    """Find bin in parameter range.
+def simulate_batch(x, y, z):
+    """Run every simulation on many materials' structural data.
+
+    Simulation modules providing `run_batch(x, y, z)` are called once with
+    whole arrays; other modules fall back to calling `run(box)` per material.
+    Only plain arrays are needed, so this can run in a worker process.
 
     Args:
-        value (float): some value, the result of a simulation.
-        bound_min (float): lower limit, defining the parameter-space.
-        bound_max (float): upper limit, defining the parameter-space.
-        bins (int): number of bins used to subdivide parameter-space.
+        x, y, z (numpy.ndarray float): structural data of materials.
 
     Returns:
-        Bin(int) corresponding to the input-value.
+        results (dict): array of each simulated property.
 
     """
-    step = (bound_max - bound_min) / bins
-    assigned_bin = (value - bound_min) // step
-    assigned_bin = min(assigned_bin, bins-1)
-    assigned_bin = max(assigned_bin, 0)
-    return int(assigned_bin)
+    results = {}
+    for module in [simulation.alpha, simulation.beta]:
+        if hasattr(module, 'run_batch'):
+            module_results = module.run_batch(x, y, z)
+        else:
+            boxes = [SimpleNamespace(x=x[i], y=y[i], z=z[i],
+                **{k: v[i] for k, v in results.items()}) for i in range(len(x))]
+            rows = [module.run(box) for box in boxes]
+            module_results = {k: np.array([row[k] for row in rows]) for k in rows[0]}
+        results.update(module_results)
+    return results
+
+def simulate_on_executor(x, y, z, executor):
+    """Run every simulation on many materials, split over an executor.
 
-def run_all_simulations(box, number_of_convergence_bins):
-    """
     Args:
-        box (sqlalchemy.orm.query.Query): material to be analyzed.
+        x, y, z (numpy.ndarray float): structural data of materials.
+        executor: executor returned by `oedipus.executor.get_executor`.
+
+    Returns:
+        results (dict): array of each simulated property.
 
     """
-    results = simulation.alpha.run(box)
-    box.update_from_dict(results)
-    box.alpha_bin = calc_bin(box.alpha, 0., 1., number_of_convergence_bins)
+    chunks = np.array_split(np.arange(len(x)), number_of_chunks(executor, len(x)))
+    chunk_results = list(executor.map(simulate_batch,
+            [x[c] for c in chunks], [y[c] for c in chunks], [z[c] for c in chunks]))
+    return {k: np.concatenate([r[k] for r in chunk_results])
+            for k in chunk_results[0]}
 
-    results = simulation.beta.run(box)
-    box.update_from_dict(results)
-    box.beta_bin = calc_bin(box.beta, 0., 1., number_of_convergence_bins)
+def simulate_arrays(x, y, z, binning, executor, cache=None):
+    """Simulate many materials on an executor.
+
+    Args:
+        x, y, z (numpy.ndarray float): structural data of materials.
+        binning (Binning): grid of the run.
+        executor: executor returned by `oedipus.executor.get_executor`.
+        cache (SimulationCache): results of geometries already simulated;
+            only the other materials are sent to the executor.
+
+    Returns:
+        results (dict): array of each simulated property, of the bin of each
+        binned property (e.g. alpha_bin) and of bin_key.
+
+    """
+    if cache is None:
+        results = simulate_on_executor(x, y, z, executor)
+    else:
+        results = cache.simulate(x, y, z, lambda x, y, z:
+                simulate_on_executor(x, y, z, executor))
+    results.update(binning.columns(results))
+    return results
 
 def print_block(string):
     print('{0}\n{1}\n{0}'.format('=' * 80, string))
 
-def evaluate_convergence(run_id, generation, convergence_cutoff_criteria):
+def evaluate_convergence(run_id, generation, convergence_cutoff_criteria,
+        bin_counts=None):
     '''Determines convergence by calculating variance of bin-counts.
     
     Args:
         run_id (str): identification string for run.
         generation (int): iteration in bin-mutate-simulate routine.
+        bin_counts (BinCounts): in-memory index of bin-counts of every
+            generation before `generation`. If None, the index is rebuilt from
+            the database.
 
     Returns:
         bool: True if variance is less than or equal to cutt-off criteria (so
-            method will continue running).
+            method will stop running).
     '''
-    query_group = [Box.alpha_bin, Box.beta_bin]
-
-    bin_counts = session \
-        .query(func.count(Box.id)) \
-        .filter(Box.run_id == run_id, Box.generation < generation) \
-        .group_by(*query_group).all()
-    bin_counts = [i[0] for i in bin_counts]    # convert SQLAlchemy result to list
-    variance = sqrt( sum([(i - (sum(bin_counts) / len(bin_counts)))**2 for i in bin_counts]) / len(bin_counts))
+    if bin_counts is None:
+        bin_counts = BinCounts.from_database(run_id, generation - 1)
+    variance = bin_counts.standard_deviation()
     print('\nCONVERGENCE:\t%s\n' % variance)
     sys.stdout.flush()
     return variance <= convergence_cutoff_criteria
 
-def oedipus(config_path):
-    """
+def restore_run(config, run_id, resume=False):
+    """Load the state a run keeps in memory from the database.
+
     Args:
+        config (dict): parameters specified in config.
         run_id (str): identification string for run.
+        resume (bool): continue from the last committed generation, with the
+            random number generator as it was then; otherwise start at
+            generation 0.
+
+    Returns:
+        first_generation (int): first generation to create.
+        population (Population): materials already committed.
+        bin_counts (BinCounts): occupancy of each bin by those materials.
+        strengths (MutationStrengthCache): latest strength of each bin, or
+            None unless the run mutates.
+        rng (numpy.random.Generator): source of every random draw.
+
+    One query each fetches the materials, the mutation strengths and the
+    state of the random number generator.
 
     """
+    population = Population.from_database(run_id)
+    bin_counts = BinCounts.from_population(population)
+    first_generation = 0
+    rng = np.random.default_rng(config.get('seed'))
+    if resume and len(population):
+        first_generation = int(population['generation'].max()) + 1
+        rng = RngState.load(run_id, first_generation - 1, config.get('seed'))
+        print_block('{} RESUMING AT GENERATION {}'.format(run_id, first_generation))
+    strengths = None
+    if config['generator_type'] == 'mutate':
+        # strengths of first_generation are recalculated as it is created
+        strengths = MutationStrengthCache.from_database(run_id,
+                config['mutate']['initial_mutation_strength'],
+                first_generation - 1 if first_generation else None)
+    return first_generation, population, bin_counts, strengths, rng
 
-    config = load_config_file(config_path)
-    run_id = datetime.now().isoformat()
+def run_in_database(config, run_id, executor, resume=False, cache=None):
+    """Run OEDIPUS-method, committing every generation to the database.
 
-    for gen in range(config['number_of_generations']):
+    Args:
+        config (dict): parameters specified in config.
+        run_id (str): identification string for run.
+        executor: executor returned by `oedipus.executor.get_executor`.
+        resume (bool): continue run_id from its last committed generation.
+        cache (SimulationCache): results of geometries already simulated, or
+            None to simulate every material.
+
+    """
+    binning = Binning.from_config(config)
+    first_generation, population, bin_counts, strengths, rng = \
+            restore_run(config, run_id, resume)
+
+    for gen in range(first_generation, config['number_of_generations']):
         print_block('{} GENERATION {}'.format(run_id, gen))
-        
+
         # create boxes, first generation is always random
-        if gen == 0 or config['generator_type'] == 'random':
-            boxes = box_generator.random.new_boxes(run_id, gen,
-                    config['children_per_generation'], {})
-        elif config['generator_type'] == 'mutate':
-            boxes = box_generator.mutate.new_boxes(run_id, gen,
-                    config['children_per_generation'], config['mutate'])
-        else:
+        with phase('generate'):
+            if gen == 0 or config['generator_type'] == 'random':
+                batch = box_generator.random.new_boxes(run_id, gen,
+                        config['children_per_generation'], {}, rng)
+            elif config['generator_type'] == 'mutate':
+                batch = box_generator.mutate.new_boxes(run_id, gen,
+                        config['children_per_generation'], config['mutate'],
+                        bin_counts=bin_counts, population=population,
+                        strengths=strengths, rng=rng)
+            else:
+                print("config['generator_type'] NOT FOUND.")
+                break
+
+        # simulate properties
+        with phase('simulate'):
+            batch.update(simulate_arrays(batch['x'], batch['y'], batch['z'],
+                    binning, executor, cache))
+
+        with phase('commit'):
+            batch.insert(config.get('insert_mode', 'orm'))
+            bin_counts.add_batch(batch)
+            population.append(**batch.columns())
+            RngState.save(run_id, gen, rng)
+            session.commit()
+
+        with phase('convergence'):
+            converged = evaluate_convergence(run_id, gen + 1,
+                    config['convergence_cutoff_criteria'], bin_counts)
+        if cache is not None:
+            cache.end_generation()
+        end_generation(gen)
+        if converged:
+            print_block('{} CONVERGED AT GENERATION {}'.format(run_id, gen))
+            break
+
+def run_in_memory(config, run_id, executor, resume=False, cache=None):
+    """Run OEDIPUS-method with the whole run held in memory.
+
+    Args:
+        config (dict): parameters specified in config.
+        run_id (str): identification string for run.
+        executor: executor returned by `oedipus.executor.get_executor`.
+        resume (bool): continue run_id from its last checkpoint in the
+            database.
+        cache (SimulationCache): results of geometries already simulated, or
+            None to simulate every material.
+
+    The database is only written every `checkpoint_interval` generations and
+    when the run ends.
+
+    """
+    if resume:
+        run = MemoryRun.from_database(run_id, config)
+        print_block('{} RESUMING AT GENERATION {}'.format(run_id,
+                run.next_generation))
+    else:
+        run = MemoryRun(run_id, config)
+    checkpoint_interval = config.get('checkpoint_interval', 100)
+
+    for gen in range(run.next_generation, config['number_of_generations']):
+        print_block('{} GENERATION {}'.format(run_id, gen))
+
+        if gen > 0 and config['generator_type'] not in ('random', 'mutate'):
             print("config['generator_type'] NOT FOUND.")
+            run.checkpoint()
             break
+        with phase('generate'):
+            children = run.new_children(gen)
+        with phase('simulate'):
+            children.update(simulate_arrays(children['x'], children['y'],
+                    children['z'], run.binning, executor, cache))
+        with phase('commit'):
+            run.add_generation(gen, children)
 
-        # simulate properties
-        for box in boxes:
-            run_all_simulations(box, config['number_of_convergence_bins'])
-            session.add(box)
-        session.commit()
+        with phase('convergence'):
+            converged = evaluate_convergence(run_id, gen + 1,
+                    config['convergence_cutoff_criteria'], run.bin_counts)
+        # the last generation is checkpointed before it is reported, so its
+        # stats include the run's final write
+        last = converged or gen + 1 == config['number_of_generations']
+        if last or (gen + 1) % checkpoint_interval == 0:
+            with phase('commit'):
+                run.checkpoint()
+        if cache is not None:
+            cache.end_generation()
+        end_generation(gen)
+        if converged:
+            print_block('{} CONVERGED AT GENERATION {}'.format(run_id, gen))
+            break
+
+def run_pipelined(config, run_id, executor, resume=False, cache=None):
+    """Run OEDIPUS-method, streaming each generation through its stages.
+
+    Args:
+        config (dict): parameters specified in config.
+        run_id (str): identification string for run.
+        executor: executor returned by `oedipus.executor.get_executor`.
+        resume (bool): continue run_id from its last committed generation.
+        cache (SimulationCache): results of geometries already simulated, or
+            None to simulate every material.
+
+    A generation is created in batches of `pipeline_batch_size` children.
+    Batches are simulated one at a time, in order, on a background thread
+    while the next batches are selected and mutated and earlier ones are
+    inserted. When more than `pipeline_depth` batches are queued or
+    simulating, the oldest is waited for and inserted before the next batch
+    is created; simulations only run in parallel within a batch, through the
+    executor. Every database call stays on the calling thread. Parents are
+    only drawn from earlier generations and the generation is committed as a
+    whole, so runs behave as with `run_in_database`.
+
+    """
+    batch_size = config.get('pipeline_batch_size', 10)
+    depth = config.get('pipeline_depth', 2)
+    binning = Binning.from_config(config)
+    children_per_generation = config['children_per_generation']
+
+    first_generation, population, bin_counts, strengths, rng = \
+            restore_run(config, run_id, resume)
+    simulator = ThreadPoolExecutor(max_workers=1)
+
+    def insert(batch, simulated):
+        with phase('simulate'):
+            batch.update(simulated.result())
+        with phase('commit'):
+            batch.insert(config.get('insert_mode', 'orm'))
+
+    try:
+        for gen in range(first_generation, config['number_of_generations']):
+            print_block('{} GENERATION {}'.format(run_id, gen))
+            if gen > 0 and config['generator_type'] not in ('random', 'mutate'):
+                print("config['generator_type'] NOT FOUND.")
+                break
+
+            pending = deque()
+            batches = []
+            for start in range(0, children_per_generation, batch_size):
+                size = min(batch_size, children_per_generation - start)
+                with phase('generate'):
+                    if gen == 0 or config['generator_type'] == 'random':
+                        batch = box_generator.random.new_boxes(run_id, gen,
+                                size, {}, rng)
+                    else:
+                        batch = box_generator.mutate.new_boxes(run_id, gen,
+                                size, config['mutate'], bin_counts=bin_counts,
+                                population=population, strengths=strengths,
+                                update_strengths=start == 0, rng=rng)
+                pending.append((batch, simulator.submit(simulate_arrays,
+                        batch['x'], batch['y'], batch['z'], binning, executor,
+                        cache)))
+                batches.append(batch)
+                if len(pending) > depth:
+                    insert(*pending.popleft())
+            while pending:
+                insert(*pending.popleft())
+
+            with phase('commit'):
+                for batch in batches:
+                    bin_counts.add_batch(batch)
+                    population.append(**batch.columns())
+                RngState.save(run_id, gen, rng)
+                session.commit()
+
+            with phase('convergence'):
+                converged = evaluate_convergence(run_id, gen + 1,
+                        config['convergence_cutoff_criteria'], bin_counts)
+            if cache is not None:
+                cache.end_generation()
+            end_generation(gen)
+            if converged:
+                print_block('{} CONVERGED AT GENERATION {}'.format(run_id, gen))
+                break
+    finally:
+        simulator.shutdown()
+
+def run_as_worker(config, run_id, executor, resume=False, cache=None):
+    """Run OEDIPUS-method as one of several workers sharing a run.
+
+    Args:
+        config (dict): parameters specified in config.
+        run_id (str): identification string for run, the same for every
+            worker.
+        executor: executor returned by `oedipus.executor.get_executor`.
+        resume (bool): start at the first generation with slots that are
+            not done, instead of loading every generation in turn.
+        cache (SimulationCache): results of geometries already simulated, or
+            None to simulate every material.
+
+    Each generation is divided into slots of `children_per_slot` children.
+    Workers claim `claim_batch_size` slots at a time through the
+    `generation_slots` table, then create, simulate and commit their children
+    independently; a slot is marked done in the same transaction as its
+    children. Once every slot of a generation is done, all workers load it and
+    move on to the next. Slots claimed more than `claim_timeout` seconds ago
+    are reclaimed, so the run survives workers that die.
+
+    """
+    children_per_generation = config['children_per_generation']
+    children_per_slot = config.get('children_per_slot', children_per_generation)
+    number_of_slots = -(-children_per_generation // children_per_slot)
+    claim_batch_size = config.get('claim_batch_size', 1)
+    claim_timeout = config.get('claim_timeout', 3600)
+    poll_interval = config.get('poll_interval', 1.)
+    binning = Binning.from_config(config)
+
+    first_generation = 0
+    population = Population(run_id)
+    if resume:
+        # skip generations every worker has finished, loading them at once
+        first_generation = GenerationSlot.first_open_generation(run_id)
+        if first_generation > 0:
+            population = Population.from_database(run_id, first_generation - 1)
+            print_block('{} RESUMING AT GENERATION {}'.format(run_id,
+                    first_generation))
+    bin_counts = BinCounts.from_population(population)
+    strengths = None
+    if config['generator_type'] == 'mutate':
+        strengths = MutationStrengthCache(run_id,
+                config['mutate']['initial_mutation_strength'])
+        if first_generation > 0:
+            strengths = MutationStrengthCache.from_database(run_id,
+                    strengths.initial_mutation_strength, first_generation - 1)
+
+    for gen in range(first_generation, config['number_of_generations']):
+        print_block('{} GENERATION {}'.format(run_id, gen))
+        if gen > 0 and config['generator_type'] not in ('random', 'mutate'):
+            print("config['generator_type'] NOT FOUND.")
+            break
+
+        with phase('claim'):
+            GenerationSlot.open_generation(run_id, gen, number_of_slots)
+        if config['generator_type'] == 'mutate':
+            box_generator.mutate.update_mutation_strengths(run_id, gen,
+                    config['mutate'], strengths)
+        while True:
+            with phase('claim'):
+                token, slots = GenerationSlot.claim(run_id, gen,
+                        claim_batch_size, claim_timeout)
+                if not slots and GenerationSlot.remaining(run_id, gen) == 0:
+                    break
+            if not slots:
+                # wait for other workers to finish their slots
+                with phase('wait'):
+                    time.sleep(poll_interval)
+                continue
+            # each slot draws from its own generator, so a seeded run creates
+            # the same children for a slot whichever worker claims it, and
+            # with whichever other slots
+            seed = config.get('seed')
+            batches = []
+            for slot in slots:
+                children = min(children_per_slot,
+                        children_per_generation - slot * children_per_slot)
+                rng = np.random.default_rng(
+                        None if seed is None else [seed, gen, slot])
+                with phase('generate'):
+                    if gen == 0 or config['generator_type'] == 'random':
+                        batch = box_generator.random.new_boxes(run_id, gen,
+                                children, {}, rng)
+                    else:
+                        batch = box_generator.mutate.new_boxes(run_id, gen,
+                                children, config['mutate'],
+                                bin_counts=bin_counts, population=population,
+                                strengths=strengths, update_strengths=False,
+                                rng=rng)
+                with phase('simulate'):
+                    batch.update(simulate_arrays(batch['x'], batch['y'],
+                            batch['z'], binning, executor, cache))
+                batches.append(batch)
+
+            with phase('commit'):
+                for batch in batches:
+                    batch.insert(config.get('insert_mode', 'orm'))
+                if GenerationSlot.complete(run_id, gen, token) == len(slots):
+                    session.commit()
+                else:
+                    # some slots timed out and were claimed by another worker
+                    session.rollback()
+                    GenerationSlot.release(run_id, gen, token)
+                    print('Claim on generation {} slots {} timed out; children discarded.'
+                            .format(gen, slots))
+
+        # every worker's children of this generation are committed
+        with phase('commit'):
+            bin_counts.load(min_generation=gen, max_generation=gen)
+            population.load(min_generation=gen, max_generation=gen)
+            session.commit()
+
+        with phase('convergence'):
+            converged = evaluate_convergence(run_id, gen + 1,
+                    config['convergence_cutoff_criteria'], bin_counts)
+        if cache is not None:
+            cache.end_generation()
+        end_generation(gen)
+        if converged:
+            print_block('{} CONVERGED AT GENERATION {}'.format(run_id, gen))
+            break
+
+def new_run_id():
+    """Identification string for a new run.
+
+    Returns:
+        run_id (str): current time followed by a random suffix, so runs
+        started in the same instant, e.g. by a sweep, never share an id.
+
+    """
+    return '{}-{}'.format(datetime.now().isoformat(), uuid.uuid4().hex[:8])
+
+def run_config(config, run_id=None, stats_path=None, stats_table=False,
+        worker=False, resume=False):
+    """Run OEDIPUS-method with the engine selected in config.
+
+    Args:
+        config (dict): parameters specified in config.
+        run_id (str): identification string for run (default = `new_run_id`).
+        stats_path (str): JSON lines file to append per-generation timings and
+            SQL statement counts to.
+        stats_table (bool): also write them to the `generation_stats` table.
+        worker (bool): run as one of several workers sharing run_id.
+        resume (bool): continue run_id where it left off.
+
+    Returns:
+        run_id (str): identification string for run.
+
+    """
+    if run_id is None:
+        run_id = new_run_id()
+    executor = get_executor(config)
+    cache = SimulationCache.from_config(config)
+    recorder = None
+    if stats_path or stats_table:
+        stats_run_id = run_id
+        if worker:
+            # workers of one run each record their own phases
+            stats_run_id = '{}/{}'.format(run_id, os.getpid())
+        recorder = StatsRecorder(stats_run_id, stats_path, stats_table)
+        recorder.start()
+
+    try:
+        if worker:
+            run_as_worker(config, run_id, executor, resume, cache)
+        elif config.get('engine', 'database') == 'memory':
+            run_in_memory(config, run_id, executor, resume, cache)
+        elif config.get('engine', 'database') == 'pipeline':
+            run_pipelined(config, run_id, executor, resume, cache)
+        else:
+            run_in_database(config, run_id, executor, resume, cache)
+    finally:
+        executor.shutdown()
+        if cache is not None:
+            cache.close()
+        if recorder:
+            recorder.stop()
+            print_block('{} PHASES\n{}'.format(run_id, recorder.summary()))
+    return run_id
+
+def oedipus(config_path, stats_path=None, stats_table=False, run_id=None,
+        worker=False, resume=False):
+    """
+    Args:
+        config_path (str): path to config file.
+        stats_path (str): JSON lines file to append per-generation timings and
+            SQL statement counts to.
+        stats_table (bool): also write them to the `generation_stats` table.
+        run_id (str): identification string for run (default = current time
+            and a random suffix).
+        worker (bool): run as one of several workers sharing run_id.
+        resume (bool): continue run_id from its last committed generation.
+
+    """
+
+    config = load_config_file(config_path)
+    run_config(config, run_id, stats_path, stats_table, worker, resume)
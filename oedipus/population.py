@@ -0,0 +1,126 @@
+import numpy as np
+from sqlalchemy import func
+
+from oedipus.db import session, Box
+from oedipus.stats import count
+
+class Population(object):
+    """Columnar, in-memory copy of the materials in one run.
+
+    Each column is a NumPy array which is fetched from the `boxes` table once
+    and then appended to as each generation is committed. Materials without a
+    parent have a `parent_id` of -1 and are their own root.
+
+    Attributes:
+        run_id (str): identification string for run.
+        size (int): number of materials held.
+
+    """
+    dtypes = {
+        'id': np.int64,
+        'parent_id': np.int64,
+        'generation': np.int32,
+        'root_id': np.int64,
+        'depth': np.int32,
+        'x': np.float64,
+        'y': np.float64,
+        'z': np.float64,
+        'alpha': np.float64,
+        'beta': np.float64,
+        'alpha_bin': np.int16,
+        'beta_bin': np.int16,
+        'bin_key': np.int64,
+    }
+
+    def __init__(self, run_id=None, capacity=1024):
+        self.run_id = run_id
+        self.size = 0
+        self._columns = {name: np.empty(capacity, dtype=dtype)
+                for name, dtype in self.dtypes.items()}
+
+    @classmethod
+    def from_database(cls, run_id, max_generation=None):
+        """Fetch the columns of every box already stored for a run in one query.
+
+        Args:
+            run_id (str): identification string for run.
+            max_generation (int): latest generation to include (default = all
+                generations).
+
+        Returns:
+            population (Population): arrays matching the database.
+
+        """
+        population = cls(run_id)
+        population.load(max_generation=max_generation)
+        return population
+
+    def load(self, min_generation=None, max_generation=None):
+        """Append the boxes of a range of generations stored in the database.
+
+        Args:
+            min_generation (int): first generation to include (default = 0).
+            max_generation (int): latest generation to include (default = all
+                generations).
+
+        """
+        names = list(self.dtypes)
+        columns = [getattr(Box, name) for name in names]
+        columns[names.index('parent_id')] = func.coalesce(Box.parent_id, -1)
+        query = session \
+            .query(*columns) \
+            .filter(Box.run_id == self.run_id)
+        if min_generation is not None:
+            query = query.filter(Box.generation >= min_generation)
+        if max_generation is not None:
+            query = query.filter(Box.generation <= max_generation)
+        rows = query.order_by(Box.id).all()
+        count('rows_loaded', len(rows))
+        if rows:
+            self.append(**dict(zip(names, zip(*rows))))
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, name):
+        return self._columns[name][:self.size]
+
+    def append(self, **columns):
+        """Add materials, growing the arrays when they are full.
+
+        Args:
+            columns: one sequence per column, all of the same length.
+
+        """
+        n = len(columns['id'])
+        capacity = len(self._columns['id'])
+        if self.size + n > capacity:
+            capacity = max(2 * capacity, self.size + n)
+            for name, values in self._columns.items():
+                grown = np.empty(capacity, dtype=values.dtype)
+                grown[:self.size] = values[:self.size]
+                self._columns[name] = grown
+        for name, values in self._columns.items():
+            values[self.size:self.size + n] = columns[name]
+        self.size += n
+
+    def center_of_mass_parents(self, size, rng=None):
+        """Draw parents with a bias favoring materials far from the center of
+        mass of the population in alpha-beta space.
+
+        Args:
+            size (int): number of parents to draw.
+            rng (numpy.random.Generator): source of random numbers (default =
+                a fresh, unseeded generator).
+
+        Returns:
+            parent_ids (numpy.ndarray int): ids of the selected
+            parent-materials.
+
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        alpha = self['alpha']
+        beta = self['beta']
+        distance = np.hypot(alpha - alpha.mean(), beta - beta.mean())
+        return rng.choice(self['id'], size=size, p=distance / distance.sum())
@@ -11,3 +11,17 @@ def run(box):
     results['alpha'] = (box.x + box.y) / 2
 
     return results
+
+def run_batch(x, y, z):
+    """
+    Args:
+        x, y, z (numpy.ndarray)
+
+    Returns:
+        results (dict of numpy.ndarray)
+
+    """
+    results = {}
+    results['alpha'] = (x + y) / 2
+
+    return results
@@ -11,3 +11,17 @@ def run(box):
     results['beta'] = box.z ** 12
 
     return results
+
+def run_batch(x, y, z):
+    """
+    Args:
+        x, y, z (numpy.ndarray)
+
+    Returns:
+        results (dict of numpy.ndarray)
+
+    """
+    results = {}
+    results['beta'] = z ** 12
+
+    return results
@@ -0,0 +1,156 @@
+from collections import OrderedDict
+import json
+import sqlite3
+import sys
+
+import numpy as np
+
+from oedipus.stats import count
+
+class SimulationCache(object):
+    """Simulated properties of materials, keyed on their quantized geometry.
+
+    Each of x, y and z is rounded to a multiple of `tolerance`, and materials
+    whose rounded geometry has been simulated before are given the stored
+    properties instead of being simulated again. The most recently used
+    `max_entries` geometries are held in memory; with a `path`, every result
+    is also written to a SQLite file, so later runs start with the results of
+    earlier ones. Delete that file after changing a simulation module.
+
+    Attributes:
+        tolerance (float): size of the geometry cells sharing one result.
+        max_entries (int): results held in memory.
+        path (str): on-disk store, or None.
+        entries (OrderedDict): properties of each quantized geometry, least
+            recently used first.
+        hits (int): materials found in the cache this generation.
+        misses (int): materials simulated this generation.
+
+    """
+    def __init__(self, tolerance=1e-6, max_entries=100000, path=None):
+        self.tolerance = tolerance
+        self.max_entries = max_entries
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._store = None
+        if path:
+            # used by one thread at a time, e.g. the pipeline's simulator
+            self._store = sqlite3.connect(path, timeout=60,
+                    check_same_thread=False)
+            self._store.execute('CREATE TABLE IF NOT EXISTS simulations ('
+                    'tolerance REAL, x INTEGER, y INTEGER, z INTEGER, '
+                    'results TEXT, PRIMARY KEY (tolerance, x, y, z))')
+
+    @classmethod
+    def from_config(cls, config):
+        """Cache of a run, if enabled.
+
+        Args:
+            config (dict): parameters specified in config. The optional
+                `simulation_cache` section sets `tolerance` (default = 1e-6),
+                `max_entries` (default = 100000) and `path` of the on-disk
+                store (default = memory only).
+
+        Returns:
+            cache (SimulationCache): or None without a `simulation_cache`
+            section.
+
+        """
+        cache_config = config.get('simulation_cache')
+        if cache_config is None:
+            return None
+        return cls(cache_config.get('tolerance', 1e-6),
+                cache_config.get('max_entries', 100000),
+                cache_config.get('path'))
+
+    def keys(self, x, y, z):
+        """Quantized geometry of many materials.
+
+        Args:
+            x, y, z (numpy.ndarray float): structural data of materials.
+
+        Returns:
+            keys (numpy.ndarray int): (N, 3) geometry, in multiples of
+            tolerance.
+
+        """
+        return np.round(np.column_stack([x, y, z]) / self.tolerance).astype(np.int64)
+
+    def _get(self, key):
+        results = self.entries.get(key)
+        if results is not None:
+            self.entries.move_to_end(key)
+        elif self._store is not None:
+            row = self._store.execute('SELECT results FROM simulations '
+                    'WHERE tolerance = ? AND x = ? AND y = ? AND z = ?',
+                    (self.tolerance,) + key).fetchone()
+            if row is not None:
+                results = json.loads(row[0])
+                self._put(key, results)
+        return results
+
+    def _put(self, key, results):
+        self.entries[key] = results
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def simulate(self, x, y, z, simulate):
+        """Simulate the materials not found in the cache.
+
+        Args:
+            x, y, z (numpy.ndarray float): structural data of materials.
+            simulate (function): called as simulate(x, y, z) on the materials
+                to simulate, returning an array of each property.
+
+        Returns:
+            results (dict): array of each simulated property of every
+            material.
+
+        Materials sharing a geometry cell within the batch are simulated
+        once.
+
+        """
+        keys = [tuple(key) for key in self.keys(x, y, z).tolist()]
+        found = [self._get(key) for key in keys]
+        missing = [i for i, results in enumerate(found) if results is None]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        # simulate the first material of each geometry missing from the cache
+        first = {}
+        for i in missing:
+            first.setdefault(keys[i], i)
+        if first:
+            rows = np.array(list(first.values()))
+            simulated = simulate(x[rows], y[rows], z[rows])
+            names = list(simulated)
+            values = zip(*(simulated[name].tolist() for name in names))
+            new = {key: dict(zip(names, row)) for key, row in zip(first, values)}
+            for key, results in new.items():
+                self._put(key, results)
+            for i in missing:
+                found[i] = new[keys[i]]
+            if self._store is not None:
+                self._store.executemany('INSERT OR REPLACE INTO simulations '
+                        'VALUES (?, ?, ?, ?, ?)', [(self.tolerance,) + key +
+                        (json.dumps(results),) for key, results in new.items()])
+                self._store.commit()
+        return {name: np.array([results[name] for results in found])
+                for name in found[0]} if found else {}
+
+    def end_generation(self):
+        """Report and reset the hits and misses of a generation, also to the
+        `StatsRecorder` if instrumentation is on."""
+        print('\nSIMULATION CACHE:\t%s hits\t%s misses\n' % (self.hits, self.misses))
+        sys.stdout.flush()
+        count('simulation_cache_hits', self.hits)
+        count('simulation_cache_misses', self.misses)
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        if self._store is not None:
+            self._store.close()
@@ -0,0 +1,199 @@
+from contextlib import contextmanager, nullcontext
+import json
+import time
+
+from sqlalchemy import event
+
+from oedipus.db import get_engine, session, GenerationStat
+
+# recorder of the running run, if instrumentation is enabled
+_recorder = None
+
+def phase(name):
+    """Attribute the time and SQL statements of a block to a phase.
+
+    Args:
+        name (str): phase of the generation, e.g. 'selection'.
+
+    Returns:
+        A context manager; it does nothing unless a `StatsRecorder` is started.
+
+    """
+    if _recorder is None:
+        return nullcontext()
+    return _recorder.phase(name)
+
+def count(name, n):
+    """Add to a counter of the current generation, if instrumentation is on.
+
+    Args:
+        name (str): counter, e.g. 'simulation_cache_hits'.
+        n (int): amount to add.
+
+    """
+    if _recorder is not None:
+        _recorder.count(name, n)
+
+def end_generation(generation):
+    """Report the phases of a finished generation, if instrumentation is on.
+
+    Args:
+        generation (int): iteration in bin-mutate-simulate routine.
+
+    """
+    if _recorder is not None:
+        _recorder.end_generation(generation)
+
+class StatsRecorder(object):
+    """Per-generation wall time, SQL statement count and rows of each phase.
+
+    Statements are counted with SQLAlchemy engine events while the recorder is
+    started. Phases may be nested; time and statements are attributed to the
+    innermost phase, and statements outside any phase to 'other'. Rows are
+    the rows written by INSERT/UPDATE/DELETE statements, as reported by the
+    driver's `cursor.rowcount`. Rows read are counted by the code loading
+    them, in the 'rows_loaded' counter.
+
+    Attributes:
+        run_id (str): identification string for run.
+        path (str): JSON lines file each generation is appended to.
+        save_to_database (bool): also write each generation to the
+            `generation_stats` table.
+        totals (dict): [seconds, statements, rows written] of each phase over
+            the run.
+        count_totals (dict): total of each counter over the run.
+        generations (int): number of generations reported.
+
+    """
+    def __init__(self, run_id, path=None, save_to_database=False):
+        self.run_id = run_id
+        self.path = path
+        self.save_to_database = save_to_database
+        self.totals = {}
+        self.count_totals = {}
+        self._counts = {}
+        self.generations = 0
+        self._current = {}
+        self._stack = []
+        self._mark = time.perf_counter()
+        self._file = None
+        self._paused = False
+        self._engine = None
+
+    def start(self):
+        global _recorder
+        _recorder = self
+        if self.path:
+            self._file = open(self.path, 'a')
+        self._engine = get_engine()
+        event.listen(self._engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def stop(self):
+        global _recorder
+        event.remove(self._engine, 'after_cursor_execute', self._after_cursor_execute)
+        if self._file:
+            self._file.close()
+        _recorder = None
+
+    def _record(self, name):
+        return self._current.setdefault(name, [0., 0, 0])
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context,
+            executemany):
+        if self._paused:
+            return
+        record = self._record(self._stack[-1] if self._stack else 'other')
+        record[1] += 1
+        # statements returning rows are reads, unless they write with RETURNING
+        writes = cursor.description is None or context.isinsert or \
+                context.isupdate or context.isdelete
+        if writes and cursor.rowcount > 0:
+            record[2] += cursor.rowcount
+
+    def _lap(self):
+        now = time.perf_counter()
+        if self._stack:
+            self._record(self._stack[-1])[0] += now - self._mark
+        self._mark = now
+
+    @contextmanager
+    def phase(self, name):
+        self._lap()
+        self._stack.append(name)
+        try:
+            yield
+        finally:
+            self._lap()
+            self._stack.pop()
+
+    def count(self, name, n):
+        self._counts[name] = self._counts.get(name, 0) + n
+
+    def end_generation(self, generation):
+        """Write the phases of a generation and add them to the run's totals.
+        Rows already in the `generation_stats` table for the generation, from
+        before a run was resumed, are replaced.
+
+        Args:
+            generation (int): iteration in bin-mutate-simulate routine.
+
+        """
+        self._lap()
+        phases = {name: {'seconds': seconds, 'statements': statements, 'rows': rows}
+                for name, (seconds, statements, rows) in self._current.items()}
+        if self._file:
+            self._file.write(json.dumps({
+                'run_id': self.run_id,
+                'generation': generation,
+                'phases': phases,
+                'counts': self._counts,
+            }) + '\n')
+            self._file.flush()
+        if self.save_to_database and phases:
+            self._paused = True
+            try:
+                # a resumed run repeats the generations after its last checkpoint
+                session.query(GenerationStat) \
+                    .filter(GenerationStat.run_id == self.run_id,
+                            GenerationStat.generation == generation) \
+                    .delete(synchronize_session=False)
+                session.execute(GenerationStat.__table__.insert(), [
+                    dict(run_id=self.run_id, generation=generation, phase=name, **values)
+                    for name, values in phases.items()])
+                session.commit()
+            finally:
+                self._paused = False
+
+        for name, record in self._current.items():
+            total = self.totals.setdefault(name, [0., 0, 0])
+            for i, value in enumerate(record):
+                total[i] += value
+        for name, n in self._counts.items():
+            self.count_totals[name] = self.count_totals.get(name, 0) + n
+        self._current = {}
+        self._counts = {}
+        self.generations += 1
+        self._mark = time.perf_counter()
+
+    def summary(self):
+        """Table of the time and SQL activity of each phase over the run.
+
+        Returns:
+            summary (str): one line per phase, then one per counter.
+
+        """
+        seconds = sum(total[0] for total in self.totals.values()) or 1.
+        lines = ['{:20s} {:>10s} {:>6s} {:>12s} {:>12s} {:>12s}'.format(
+            'PHASE', 'SECONDS', '%', 'S/GEN', 'STATEMENTS', 'ROWS WRITTEN')]
+        for name, (phase_seconds, statements, rows) in sorted(self.totals.items(),
+                key=lambda e: -e[1][0]):
+            lines.append('{:20s} {:10.3f} {:6.1f} {:12.6f} {:12d} {:12d}'.format(
+                name, phase_seconds, 100 * phase_seconds / seconds,
+                phase_seconds / max(self.generations, 1), statements, rows))
+        if self.count_totals:
+            lines.append('{:20s} {:>10s} {:>6s} {:>12s}'.format(
+                'COUNTER', 'TOTAL', '', 'PER GEN'))
+            for name, total in sorted(self.count_totals.items()):
+                lines.append('{:20s} {:10d} {:6s} {:12.1f}'.format(
+                    name, total, '', total / max(self.generations, 1)))
+        return '\n'.join(lines)
@@ -0,0 +1,70 @@
+import numpy as np
+
+from oedipus.db import MutationStrength
+
+class MutationStrengthCache(object):
+    """Current mutation strength of every bin in one run.
+
+    Strengths are held sparsely, by bin key, for the bins that have a history;
+    every other bin has the initial strength. The cache is loaded from the
+    `mutation_strengths` table once and then updated whenever new rows are
+    written, so children can be mutated without querying
+    `MutationStrength.get_prior`.
+
+    Attributes:
+        run_id (str): identification string for run.
+        initial_mutation_strength (float): strength of bins without history.
+        strengths (dict): latest strength of each bin key with a history.
+
+    """
+    def __init__(self, run_id, initial_mutation_strength):
+        self.run_id = run_id
+        self.initial_mutation_strength = initial_mutation_strength
+        self.strengths = {}
+
+    @classmethod
+    def from_database(cls, run_id, initial_mutation_strength, max_generation=None):
+        """Load the latest strength of every bin with one query.
+
+        Args:
+            run_id (str): identification string for run.
+            initial_mutation_strength (float): strength of bins without history.
+            max_generation (int): latest generation to include (default = all
+                generations).
+
+        Returns:
+            cache (MutationStrengthCache): strengths matching the database.
+
+        """
+        cache = cls(run_id, initial_mutation_strength)
+        cache.update(MutationStrength.get_priors(run_id, max_generation, None,
+                initial_mutation_strength))
+        return cache
+
+    def __getitem__(self, keys):
+        """Strength of each of many bins.
+
+        Args:
+            keys (numpy.ndarray int): bin keys.
+
+        Returns:
+            strengths (numpy.ndarray float): strength of each bin.
+
+        """
+        return np.array([self.strengths.get(key, self.initial_mutation_strength)
+                for key in np.asarray(keys).tolist()], dtype=float)
+
+    def get(self, key):
+        return self.strengths.get(key, self.initial_mutation_strength)
+
+    def __setitem__(self, key, value):
+        self.strengths[key] = value
+
+    def update(self, strengths):
+        """Record newly written strengths.
+
+        Args:
+            strengths (dict): mutation strength of each bin key.
+
+        """
+        self.strengths.update(strengths)
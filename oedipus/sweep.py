@@ -0,0 +1,152 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from copy import deepcopy
+from itertools import product
+import multiprocessing
+import time
+
+from sqlalchemy.sql import func
+
+from oedipus.files import load_config_file
+from oedipus.db import session, get_engine, load_database_config, Box
+from oedipus.oedipus import run_config, new_run_id, print_block
+
+def expand_grid(base_config, grid):
+    """Configs of every combination of the values in a grid.
+
+    Args:
+        base_config (dict): parameters shared by every run.
+        grid (dict): list of values of each swept parameter. Dotted names set
+            nested parameters, e.g. 'mutate.selection_scheme'.
+
+    Returns:
+        configs (list): (parameters, config) of each combination, where
+        parameters (dict) holds the swept values of that run.
+
+    """
+    names = list(grid)
+    configs = []
+    for values in product(*(grid[name] for name in names)):
+        config = deepcopy(base_config)
+        for name, value in zip(names, values):
+            *parents, key = name.split('.')
+            section = config
+            for parent in parents:
+                section = section.setdefault(parent, {})
+            section[key] = value
+        configs.append((dict(zip(names, values)), config))
+    return configs
+
+def pool_settings(max_connections, processes):
+    """Connection pool of each run, so the sweep stays within a budget.
+
+    Args:
+        max_connections (int): database connections shared by every run.
+        processes (int): runs at once.
+
+    Returns:
+        settings (dict): `pool_size` and `max_overflow` of each process.
+
+    A run only uses the database from one thread, so one connection each is
+    enough; any spare connections are shared out evenly.
+
+    """
+    return dict(pool_size=max(1, max_connections // processes), max_overflow=0)
+
+def run_one(config, run_id, pool):
+    """Run one configuration of a sweep in a process of the pool.
+
+    Args:
+        config (dict): parameters specified in config.
+        run_id (str): identification string for run.
+        pool (dict): pool settings of this process's engine.
+
+    Returns:
+        result (dict): `seconds` the run took, and the `materials` and
+        `generations` it stored.
+
+    """
+    dbconfig = load_database_config()
+    if 'sqlite' not in dbconfig['connection_string']:
+        dbconfig.update(pool)
+    get_engine(dbconfig)
+
+    start = time.time()
+    run_config(config, run_id)
+    seconds = time.time() - start
+    materials, last_generation = session \
+        .query(func.count(Box.id), func.max(Box.generation)) \
+        .filter(Box.run_id == run_id).one()
+    session.remove()
+    return dict(seconds=seconds, materials=materials,
+            generations=0 if last_generation is None else last_generation + 1)
+
+def sweep(sweep_path, processes=None):
+    """Run every configuration of a grid concurrently, sharing one database.
+
+    Args:
+        sweep_path (str): sweep file naming the base `config`, the `grid` of
+            swept parameters, and optionally `processes` (default = 1) and
+            `max_connections` (default = one per process).
+        processes (int): runs at once, overriding the sweep file.
+
+    Returns:
+        results (list dict): run_id, swept parameters and throughput of each
+        run, in grid order. Failed runs have an `error` instead.
+
+    Run ids share one sweep id, followed by the index of the run in the grid.
+
+    """
+    sweep_config = load_config_file(sweep_path)
+    configs = expand_grid(load_config_file(sweep_config['config']),
+            sweep_config['grid'])
+    processes = min(processes or sweep_config.get('processes', 1), len(configs))
+    max_connections = sweep_config.get('max_connections', processes)
+    if max_connections < processes:
+        print('max_connections ({}) is less than processes; running {} at once.'
+                .format(max_connections, max_connections))
+        processes = max_connections
+    pool = pool_settings(max_connections, processes)
+
+    sweep_id = new_run_id()
+    results = [dict(run_id='{}-{}'.format(sweep_id, i), parameters=parameters)
+            for i, (parameters, _) in enumerate(configs)]
+    print_block('SWEEP {}: {} RUNS, {} AT ONCE'.format(sweep_id, len(configs),
+            processes))
+    start = time.time()
+    # spawned runs never share the parent's open database connections
+    with ProcessPoolExecutor(max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = {executor.submit(run_one, config, result['run_id'], pool): result
+                for result, (_, config) in zip(results, configs)}
+        for future in as_completed(futures):
+            result = futures[future]
+            try:
+                result.update(future.result())
+            except Exception as e:
+                result['error'] = repr(e)
+            print(format_result(result))
+    seconds = time.time() - start
+    print_block('SWEEP {}\n{}\n{} runs in {:.1f} s'.format(sweep_id,
+            '\n'.join(format_result(result) for result in results),
+            len(results), seconds))
+    return results
+
+def format_result(result):
+    """One line describing a run of a sweep.
+
+    Args:
+        result (dict): as returned by `sweep`.
+
+    Returns:
+        line (str): run_id, swept parameters and throughput or error.
+
+    """
+    parameters = ' '.join('{}={}'.format(name, value)
+            for name, value in result['parameters'].items())
+    if 'error' in result:
+        return '{}  {}  FAILED {}'.format(result['run_id'], parameters,
+                result['error'])
+    return '{}  {}  {} generations  {} materials  {:.1f} s  {:.1f} materials/s' \
+        .format(result['run_id'], parameters, result['generations'],
+                result['materials'], result['seconds'],
+                result['materials'] / max(result['seconds'], 1e-9))
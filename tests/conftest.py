@@ -0,0 +1,27 @@
+import pytest
+
+from oedipus.db import get_engine, session
+
+@pytest.fixture
+def database(tmp_path):
+    """Point the module's session at an empty SQLite file for one test."""
+    get_engine({'connection_string': 'sqlite:///{}'.format(tmp_path / 'oedipus.db')})
+    yield session
+    session.remove()
+
+@pytest.fixture
+def config():
+    """Small run of the mutate generator, seeded so it can be repeated."""
+    return {
+        'generator_type': 'mutate',
+        'convergence_cutoff_criteria': -1.,
+        'number_of_convergence_bins': 5,
+        'number_of_generations': 6,
+        'children_per_generation': 20,
+        'seed': 0,
+        'mutate': {
+            'initial_mutation_strength': 0.2,
+            'mutation_scheme': 'hybrid_adaptive',
+            'selection_scheme': 'hybrid',
+        },
+    }
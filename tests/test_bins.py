@@ -0,0 +1,59 @@
+from math import sqrt
+
+import numpy as np
+import pytest
+from sqlalchemy import func
+
+from oedipus.bins import AliasTable, BinCounts
+from oedipus.db import Box
+from oedipus.executor import SerialExecutor
+from oedipus.memory import MemoryRun
+from oedipus.oedipus import simulate_arrays
+
+@pytest.mark.parametrize('weights', [
+    [1, 2, 3, 4],
+    [10, 0, 1, 0, 5],
+    [0.5, 0.25, 0.125, 0.125],
+    np.arange(1, 101) ** 2,
+])
+def test_alias_table_draws_match_weights(weights):
+    draws = 200000
+    outcomes = AliasTable(weights).draw(draws, np.random.default_rng(0))
+    frequencies = np.bincount(outcomes, minlength=len(weights)) / draws
+    expected = np.asarray(weights, dtype=float) / np.sum(weights)
+    assert np.allclose(frequencies, expected, atol=0.005)
+    assert np.all(frequencies[expected == 0] == 0)
+
+def test_alias_table_single_outcome():
+    outcomes = AliasTable([3]).draw(1000, np.random.default_rng(0))
+    assert np.all(outcomes == 0)
+
+def group_by_standard_deviation(bin_counts):
+    """Spread of bin-counts as evaluate_convergence computed it from a GROUP BY."""
+    mean = sum(bin_counts) / len(bin_counts)
+    return sqrt(sum([(i - mean) ** 2 for i in bin_counts]) / len(bin_counts))
+
+def test_standard_deviation_matches_group_by_formula():
+    rng = np.random.default_rng(0)
+    bin_counts = BinCounts()
+    for box_id, key in enumerate(rng.integers(0, 25, 1000).tolist()):
+        bin_counts.add(box_id, key)
+    assert bin_counts.standard_deviation() == pytest.approx(
+            group_by_standard_deviation(list(bin_counts.counts.values())))
+
+def test_standard_deviation_matches_database(database, config):
+    run = MemoryRun('bins', config)
+    for gen in range(config['number_of_generations']):
+        batch = run.new_children(gen)
+        batch.update(simulate_arrays(batch['x'], batch['y'], batch['z'],
+                run.binning, SerialExecutor()))
+        run.add_generation(gen, batch)
+    run.checkpoint()
+
+    for generation in range(config['number_of_generations']):
+        counts = [row[0] for row in database \
+            .query(func.count(Box.id)) \
+            .filter(Box.run_id == 'bins', Box.generation <= generation) \
+            .group_by(Box.alpha_bin, Box.beta_bin)]
+        assert BinCounts.from_database('bins', generation).standard_deviation() \
+                == pytest.approx(group_by_standard_deviation(counts))
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from oedipus.db import get_engine, Box
+from oedipus.db.migrate import add_lineage
+from oedipus.lineage import Lineage
+from oedipus.oedipus import run_config
+
+@pytest.fixture
+def run_id(database, config):
+    """Run committed generation by generation, so lineage is set on insert."""
+    return run_config(config, 'lineage')
+
+def parents_by_id(database, run_id):
+    return dict(database.query(Box.id, Box.parent_id).filter(Box.run_id == run_id))
+
+def walk_ancestors(parents, box_id):
+    ancestors = []
+    while parents[box_id] is not None:
+        box_id = parents[box_id]
+        ancestors.append(box_id)
+    return ancestors
+
+def test_root_and_depth_match_parent_walk(database, run_id):
+    parents = parents_by_id(database, run_id)
+    lineage = Lineage.from_database(run_id)
+    assert lineage.depth.max() > 1
+    for box_id, root_id, depth in zip(lineage.ids.tolist(),
+            lineage.root_id.tolist(), lineage.depth.tolist()):
+        ancestors = walk_ancestors(parents, box_id)
+        assert root_id == (ancestors[-1] if ancestors else box_id)
+        assert depth == len(ancestors)
+
+@pytest.mark.parametrize('max_distance', [None, 1, 3])
+def test_ancestors_match_parent_walk(database, run_id, max_distance):
+    parents = parents_by_id(database, run_id)
+    ids = sorted(parents)
+    expected = [(box_id, ancestor_id, distance) for box_id in ids
+            for distance, ancestor_id in enumerate(walk_ancestors(parents, box_id), 1)
+            if max_distance is None or distance <= max_distance]
+    found = Lineage.from_database(run_id).ancestors(ids, max_distance)
+    assert list(zip(*(column.tolist() for column in found))) == expected
+
+@pytest.mark.parametrize('max_distance', [None, 1, 3])
+def test_descendants_match_parent_walk(database, run_id, max_distance):
+    parents = parents_by_id(database, run_id)
+    ids = sorted(parents)
+    expected = sorted((ancestor_id, box_id, distance) for box_id in ids
+            for distance, ancestor_id in enumerate(walk_ancestors(parents, box_id), 1)
+            if max_distance is None or distance <= max_distance)
+    found = Lineage.from_database(run_id).descendants(ids, max_distance)
+    found = list(zip(*(column.tolist() for column in found)))
+    assert sorted(found, key=lambda e: (e[0], e[2], e[1])) == found
+    assert sorted(found) == expected
+
+def test_root_counts_match_parent_walk(database, run_id):
+    parents = parents_by_id(database, run_id)
+    bin_keys = dict(database.query(Box.id, Box.bin_key).filter(Box.run_id == run_id))
+    expected = {}
+    for box_id in parents:
+        ancestors = walk_ancestors(parents, box_id)
+        key = (bin_keys[box_id], ancestors[-1] if ancestors else box_id)
+        expected[key] = expected.get(key, 0) + 1
+
+    bin_keys, root_ids, counts = Lineage.from_database(run_id).root_counts()
+    assert dict(zip(zip(bin_keys.tolist(), root_ids.tolist()), counts.tolist())) \
+            == expected
+    assert np.all(np.diff(bin_keys) >= 0)
+
+def test_add_lineage_matches_insert_time(database, run_id):
+    inserted = database.query(Box.id, Box.root_id, Box.depth) \
+        .filter(Box.run_id == run_id).order_by(Box.id).all()
+    database.query(Box).update({Box.root_id: None, Box.depth: None},
+            synchronize_session=False)
+    database.commit()
+
+    changes = add_lineage(get_engine())
+    assert changes == ['set root_id and depth of {} boxes'.format(len(inserted))]
+    assert database.query(Box.id, Box.root_id, Box.depth) \
+        .filter(Box.run_id == run_id).order_by(Box.id).all() == inserted
+    assert add_lineage(get_engine()) == []
@@ -0,0 +1,74 @@
+from sqlalchemy import (create_engine, inspect, MetaData, Table, Column,
+        Integer, String, Float, PrimaryKeyConstraint)
+
+from oedipus.db import Base
+from oedipus.db.migrate import migrate
+
+BINS = 5
+
+def create_old_schema(bind):
+    """Tables as created before bin keys and lineage were stored."""
+    metadata = MetaData()
+    boxes = Table('boxes', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('run_id', String(50), index=True),
+        Column('uuid', String(40)),
+        Column('parent_id', Integer),
+        Column('generation', Integer, index=True),
+        Column('x', Float),
+        Column('y', Float),
+        Column('z', Float),
+        Column('alpha', Float, index=True),
+        Column('beta', Float, index=True),
+        Column('alpha_bin', Integer),
+        Column('beta_bin', Integer),
+    )
+    strengths = Table('mutation_strengths', metadata,
+        Column('run_id', String(50)),
+        Column('generation', Integer),
+        Column('alpha_bin', Integer),
+        Column('beta_bin', Integer),
+        Column('strength', Float),
+        PrimaryKeyConstraint('run_id', 'generation', 'alpha_bin', 'beta_bin'),
+    )
+    metadata.create_all(bind)
+    return boxes, strengths
+
+def test_migrate_adds_bin_keys_and_lineage(tmp_path):
+    bind = create_engine('sqlite:///{}'.format(tmp_path / 'old.db'))
+    boxes, strengths = create_old_schema(bind)
+    parents = [None, None, 1, 3, 2, None, 4]
+    bind.execute(boxes.insert(), [{
+        'id': box_id, 'run_id': 'old', 'parent_id': parent_id,
+        'generation': box_id // 3, 'alpha_bin': box_id % BINS,
+        'beta_bin': (3 * box_id) % BINS,
+    } for box_id, parent_id in enumerate(parents, 1)])
+    old_strengths = [(generation, alpha_bin, beta_bin, 0.1 * generation + alpha_bin)
+            for generation in range(2) for alpha_bin in range(BINS)
+            for beta_bin in [0, 4]]
+    bind.execute(strengths.insert(), [{'run_id': 'old', 'generation': generation,
+            'alpha_bin': alpha_bin, 'beta_bin': beta_bin, 'strength': strength}
+            for generation, alpha_bin, beta_bin, strength in old_strengths])
+    # as `get_engine` does, which creates tables missing from the database
+    Base.metadata.create_all(bind)
+
+    changes = migrate(bind, BINS)
+    assert 'rebuilt mutation_strengths keyed by bin_key' in changes
+
+    for alpha_bin, beta_bin, bin_key in bind.execute(
+            'SELECT alpha_bin, beta_bin, bin_key FROM boxes'):
+        assert bin_key == alpha_bin * BINS + beta_bin
+    assert bind.execute('SELECT generation, bin_key, strength '
+            'FROM mutation_strengths ORDER BY generation, bin_key').fetchall() == [
+        (generation, alpha_bin * BINS + beta_bin, strength)
+        for generation, alpha_bin, beta_bin, strength in old_strengths]
+    assert [c['name'] for c in inspect(bind).get_columns('mutation_strengths')] == \
+            ['run_id', 'generation', 'bin_key', 'strength']
+    assert bind.execute('SELECT id, root_id, depth FROM boxes ORDER BY id') \
+        .fetchall() == [(1, 1, 0), (2, 2, 0), (3, 1, 1), (4, 1, 2), (5, 2, 1),
+                (6, 6, 0), (7, 1, 3)]
+
+    indexes = {index['name'] for index in inspect(bind).get_indexes('boxes')}
+    assert 'ix_boxes_run_id' not in indexes
+    assert 'ix_boxes_run_id_bin_key' in indexes
+    assert migrate(bind, BINS) == []
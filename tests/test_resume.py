@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from oedipus import oedipus
+from oedipus.db import MutationStrength, RngState, GenerationStat
+from oedipus.population import Population
+
+class Crash(Exception):
+    pass
+
+def boxes(run_id):
+    """Columns of a run, with parents and roots as rows instead of ids."""
+    population = Population.from_database(run_id)
+    ids = population['id']
+    columns = {name: population[name] for name in
+            ['x', 'y', 'z', 'alpha', 'beta', 'bin_key', 'generation', 'depth']}
+    columns['parent'] = np.where(population['parent_id'] < 0, -1,
+            np.searchsorted(ids, population['parent_id']))
+    columns['root'] = np.searchsorted(ids, population['root_id'])
+    return columns
+
+def strengths(database, run_id):
+    return database \
+        .query(MutationStrength.generation, MutationStrength.bin_key,
+                MutationStrength.strength) \
+        .filter(MutationStrength.run_id == run_id) \
+        .order_by(MutationStrength.generation, MutationStrength.bin_key).all()
+
+def rng_states(database, run_id):
+    return database.query(RngState.generation, RngState.state) \
+        .filter(RngState.run_id == run_id).order_by(RngState.generation).all()
+
+@pytest.mark.parametrize('engine', ['database', 'memory', 'pipeline'])
+def test_resumed_run_matches_uninterrupted_run(database, config, monkeypatch,
+        engine):
+    config.update(engine=engine, number_of_generations=8, checkpoint_interval=3,
+            pipeline_batch_size=7)
+    oedipus.run_config(config, 'uninterrupted')
+
+    # die at the end of generation 4, after the stats of generation 3 were
+    # written but the memory engine last checkpointed generation 2
+    evaluate_convergence = oedipus.evaluate_convergence
+    def crash(run_id, generation, *args, **kwargs):
+        if generation == 5:
+            raise Crash()
+        return evaluate_convergence(run_id, generation, *args, **kwargs)
+    monkeypatch.setattr(oedipus, 'evaluate_convergence', crash)
+    with pytest.raises(Crash):
+        oedipus.run_config(config, 'resumed', stats_table=True)
+    database.rollback()
+    monkeypatch.setattr(oedipus, 'evaluate_convergence', evaluate_convergence)
+    oedipus.run_config(config, 'resumed', stats_table=True, resume=True)
+
+    expected, found = boxes('uninterrupted'), boxes('resumed')
+    assert len(found['x']) == 8 * config['children_per_generation']
+    for name in expected:
+        assert np.array_equal(found[name], expected[name]), name
+    assert strengths(database, 'resumed') == strengths(database, 'uninterrupted')
+    assert rng_states(database, 'resumed') == rng_states(database, 'uninterrupted')
+    assert database.query(GenerationStat) \
+        .filter(GenerationStat.run_id == 'resumed', GenerationStat.generation == 7) \
+        .count() > 0
@@ -0,0 +1,22 @@
+import json
+
+import pytest
+
+from oedipus.db import GenerationStat
+from oedipus.oedipus import run_config
+
+@pytest.mark.parametrize('engine', ['database', 'memory', 'pipeline'])
+def test_every_write_is_reported(database, config, tmp_path, engine):
+    config.update(engine=engine, number_of_generations=8)
+    stats_path = tmp_path / 'stats.jsonl'
+    run_config(config, 'stats', str(stats_path), stats_table=True)
+
+    with open(str(stats_path)) as stats_file:
+        records = [json.loads(line) for line in stats_file]
+    assert [record['generation'] for record in records] == list(range(8))
+    rows = sum(phase['rows'] for record in records
+            for phase in record['phases'].values())
+    # every box, plus the strengths and random number generator states
+    assert rows > 8 * config['children_per_generation']
+    assert database.query(GenerationStat) \
+        .filter(GenerationStat.run_id == 'stats').count() > 0
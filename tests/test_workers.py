@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import numpy as np
+import pytest
+
+from oedipus.db import session, GenerationSlot
+from oedipus.oedipus import run_config
+from oedipus.population import Population
+
+@pytest.fixture
+def other_worker(database):
+    """Runs calls on a thread of its own, and so in a session of its own."""
+    thread = ThreadPoolExecutor(max_workers=1)
+    yield lambda function, *args: thread.submit(function, *args).result()
+    thread.submit(session.remove).result()
+    thread.shutdown()
+
+def test_claim_complete_timeout_and_release(database, other_worker):
+    GenerationSlot.open_generation('slots', 0, 3)
+    token, slots = GenerationSlot.claim('slots', 0, 2, 3600)
+    assert slots == [0, 1]
+    other_token, other_slots = other_worker(GenerationSlot.claim, 'slots', 0, 2, 3600)
+    assert other_slots == [2]
+    assert other_worker(GenerationSlot.claim, 'slots', 0, 2, 3600)[1] == []
+    assert GenerationSlot.remaining('slots', 0) == 3
+
+    assert GenerationSlot.complete('slots', 0, token) == 2
+    database.commit()
+    assert GenerationSlot.remaining('slots', 0) == 1
+    assert GenerationSlot.claim('slots', 0, 2, 3600)[1] == []
+
+    # the other worker's claim times out and is taken over
+    time.sleep(0.01)
+    late_token, late_slots = GenerationSlot.claim('slots', 0, 2, 0)
+    assert late_slots == [2]
+
+    def complete_or_release(token):
+        if GenerationSlot.complete('slots', 0, token) == 1:
+            session.commit()
+            return True
+        session.rollback()
+        GenerationSlot.release('slots', 0, token)
+        return False
+    assert not other_worker(complete_or_release, other_token)
+    assert GenerationSlot.remaining('slots', 0) == 1
+
+    # releasing reopens the slot for any worker
+    GenerationSlot.release('slots', 0, late_token)
+    other_token, other_slots = other_worker(GenerationSlot.claim, 'slots', 0, 2, 3600)
+    assert other_slots == [2]
+    assert GenerationSlot.first_open_generation('slots') == 0
+    assert GenerationSlot.complete('slots', 0, late_token) == 0
+    database.rollback()
+
+    assert other_worker(complete_or_release, other_token)
+    assert GenerationSlot.remaining('slots', 0) == 0
+    assert GenerationSlot.first_open_generation('slots') == 1
+
+def rows(population, name):
+    """Rows of the materials an id column refers to, or -1."""
+    ids = population[name]
+    return np.where(ids < 0, -1, np.searchsorted(population['id'], ids))
+
+def test_children_do_not_depend_on_claim_batch_size(database, config):
+    config.update(number_of_generations=4, children_per_slot=6)
+    for claim_batch_size in [1, 3]:
+        config['claim_batch_size'] = claim_batch_size
+        run_config(config, 'claims-{}'.format(claim_batch_size), worker=True)
+
+    one = Population.from_database('claims-1')
+    three = Population.from_database('claims-3')
+    assert len(one) == 4 * config['children_per_generation']
+    for name in ['x', 'y', 'z', 'generation', 'bin_key', 'depth']:
+        assert np.array_equal(one[name], three[name]), name
+    for name in ['parent_id', 'root_id']:
+        assert np.array_equal(rows(one, name), rows(three, name)), name